@@ -11,7 +11,9 @@ from datetime import datetime, timedelta
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db_connector import query_documents, get_database_stats, log_chat
+from db_backend import get_database_stats, chat_log
+from search.hybrid import search_documents_page
+from search.semantic import semantic_search
 
 # Configure logging
 logging.basicConfig(
@@ -20,11 +22,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger("agent")
 
+# Ollama HTTP client settings: pooled keep-alive connections and timeouts (seconds)
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 8))
+OLLAMA_KEEPALIVE = float(os.getenv("OLLAMA_KEEPALIVE", 60))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 10))
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", 300))
+
+async def _on_connection_create_start(session, context, params):
+    context.trace_request_ctx["_connect_started"] = asyncio.get_running_loop().time()
+
+async def _on_connection_create_end(session, context, params):
+    timings = context.trace_request_ctx
+    timings["connect_ms"] = round((asyncio.get_running_loop().time() - timings.pop("_connect_started")) * 1000, 1)
+    timings["reused"] = False
+
+async def _on_connection_reuseconn(session, context, params):
+    context.trace_request_ctx["reused"] = True
+
+def _timing_trace() -> aiohttp.TraceConfig:
+    """Trace that records connection setup (or reuse) into the request's timings dict"""
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(_on_connection_create_start)
+    trace.on_connection_create_end.append(_on_connection_create_end)
+    trace.on_connection_reuseconn.append(_on_connection_reuseconn)
+    return trace
+
 class Agent:
     def __init__(self, model_name="qwen2.5:1.5b-instruct-q4_K_M", ollama_url=None):
         """Initialize the agent with model configuration"""
         self.model_name = model_name
         self.ollama_url = ollama_url or os.getenv("OLLAMA_URL", "http://localhost:11434")
+        # One keep-alive session for every LLM call, created on first use
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        self.http_stats = {"calls": 0, "errors": 0, "connections": 0, "reused": 0,
+                           "first_byte_ms_total": 0.0, "total_ms_total": 0.0}
         self.tools = [
             {
                 "type": "function",
@@ -54,12 +86,44 @@ class Agent:
                                 "type": "integer",
                                 "description": "Maximum number of results to return",
                                 "default": 10
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "next_cursor from a previous result with the same criteria, to fetch the next page"
+                            },
+                            "rank": {
+                                "type": "string",
+                                "enum": ["date", "relevance"],
+                                "description": "Result order: 'date' (default) for newest first, 'relevance' for the best keyword matches first",
+                                "default": "date"
                             }
                         },
                         "required": []
                     }
                 }
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "semantic_search",
+                    "description": "Find Federal Register documents that are similar in meaning to a description, even when they do not share its exact keywords",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "query": {
+                                "type": "string",
+                                "description": "Natural language description of the documents to find"
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": "Maximum number of results to return",
+                                "default": 10
+                            }
+                        },
+                        "required": ["query"]
+                    }
+                }
+            },
             {
                 "type": "function",
                 "function": {
@@ -95,6 +159,8 @@ class Agent:
 
 When users ask about federal regulations, executive orders, or other government documents, use the query_federal_register tool to search the database.
 You can search by keywords, document type, and date range.
+For conceptual questions where the exact wording of documents is unknown, use the semantic_search tool instead.
+Results are newest first. When the best match for the keywords matters more than recency, set rank to "relevance". Results come one page at a time. When the user asks for more results, call the tool again with the same criteria and the next_cursor from the previous result.
 
 Available document types include:
 - executive_order (Executive Orders)
@@ -190,32 +256,29 @@ Also, do not reveal the names of the tools you are using to the user.
             
             try:
                 if name == "query_federal_register":
-                    # Execute the database query
-                    documents = await query_documents(
+                    # One page, newest first unless relevance ranking was asked for
+                    page = await search_documents_page(
                         keywords=arguments.get("keywords"),
                         document_type=arguments.get("document_type"),
                         start_date=arguments.get("start_date"),
                         end_date=arguments.get("end_date"),
-                        limit=arguments.get("limit", 10)
+                        cursor=arguments.get("cursor"),
+                        limit=arguments.get("limit", 10),
+                        rank=arguments.get("rank")
                     )
                     
-                    # Ensure document_type is never null in the response
-                    for doc in documents:
-                        if doc.get("document_type") is None:
-                            doc["document_type"] = "unspecified"
-                        
-                        # Make sure the document type is set to a standard value if possible
-                        if doc.get("document_type") == "unspecified":
-                            # Try to infer document type from title or other fields
-                            title = doc.get("title", "").lower()
-                            if "executive order" in title or title.startswith("eo"):
-                                doc["document_type"] = "executive_order"
-                            elif "notice" in title:
-                                doc["document_type"] = "notice"
-                            elif "rule" in title and "proposed" in title:
-                                doc["document_type"] = "proposed_rule"
-                            elif "rule" in title:
-                                doc["document_type"] = "rule"
+                    results.append({
+                        "tool_call_id": tool_call.get("id"),
+                        "role": "tool",
+                        "name": name,
+                        "content": json.dumps(page)
+                    })
+                
+                elif name == "semantic_search":
+                    documents = await semantic_search(
+                        arguments.get("query", ""),
+                        limit=arguments.get("limit", 10)
+                    )
                     
                     results.append({
                         "tool_call_id": tool_call.get("id"),
@@ -282,44 +345,111 @@ Also, do not reveal the names of the tools you are using to the user.
             
         return results
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=OLLAMA_MAX_CONNECTIONS, keepalive_timeout=OLLAMA_KEEPALIVE, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=OLLAMA_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+                trace_configs=[_timing_trace()]
+            )
+            self._session_loop = loop
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the pooled LLM session (app shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def _finish_call(self, timings: Dict[str, Any], started: float, error: bool = False) -> Dict[str, Any]:
+        """Record a completed LLM call's total time in its timings and in http_stats"""
+        timings["total_ms"] = round((asyncio.get_running_loop().time() - started) * 1000, 1)
+        self.http_stats["calls"] += 1
+        self.http_stats["errors"] += int(error)
+        self.http_stats["reused" if timings.get("reused") else "connections"] += 1
+        self.http_stats["first_byte_ms_total"] += timings.get("first_byte_ms", 0.0)
+        self.http_stats["total_ms_total"] += timings["total_ms"]
+        return timings
+    
+    def get_http_stats(self) -> Dict[str, Any]:
+        """LLM call counters: connections opened vs reused, average first-byte and total times"""
+        calls = self.http_stats["calls"]
+        return {
+            "calls": calls,
+            "errors": self.http_stats["errors"],
+            "connections": self.http_stats["connections"],
+            "reused": self.http_stats["reused"],
+            "first_byte_ms_avg": round(self.http_stats["first_byte_ms_total"] / calls, 1) if calls else 0.0,
+            "total_ms_avg": round(self.http_stats["total_ms_total"] / calls, 1) if calls else 0.0,
+            "max_connections": OLLAMA_MAX_CONNECTIONS
+        }
+
     async def get_completion(self, messages: List[Dict[str, Any]], stream: bool = False) -> Dict[str, Any]:
-        """Get a completion from the LLM"""
-        async with aiohttp.ClientSession() as session:
-            # Ensure all messages have proper format
-            sanitized_messages = []
-            for msg in messages:
-                # Ensure content is a string
-                if "content" in msg and not isinstance(msg["content"], str):
-                    try:
-                        msg["content"] = str(msg["content"])
-                    except:
-                        msg["content"] = "Error converting content to string"
-                sanitized_messages.append(msg)
+        """Get a completion from the LLM
+        
+        The result carries "timings" (connect_ms, reused, first_byte_ms,
+        total_ms). A streaming result holds the open response under "stream";
+        the caller reads it and then calls finish_stream().
+        """
+        # Ensure all messages have proper format
+        sanitized_messages = []
+        for msg in messages:
+            # Ensure content is a string
+            if "content" in msg and not isinstance(msg["content"], str):
+                try:
+                    msg["content"] = str(msg["content"])
+                except:
+                    msg["content"] = "Error converting content to string"
+            sanitized_messages.append(msg)
+        
+        payload = {
+            "model": self.model_name,
+            "messages": sanitized_messages,
+            "tools": self.tools,
+            "temperature": 0.2,
+            "stream": stream
+        }
+        
+        timings: Dict[str, Any] = {"connect_ms": 0.0, "reused": True}
+        started = asyncio.get_running_loop().time()
+        response = None
+        try:
+            session = await self._get_session()
+            response = await session.post(f"{self.ollama_url}/api/chat", json=payload, trace_request_ctx=timings)
+            timings["first_byte_ms"] = round((asyncio.get_running_loop().time() - started) * 1000, 1)
             
-            payload = {
-                "model": self.model_name,
-                "messages": sanitized_messages,
-                "tools": self.tools,
-                "temperature": 0.2,
-                "stream": stream
-            }
+            if response.status != 200:
+                error_text = await response.text()
+                await response.release()
+                self._finish_call(timings, started, error=True)
+                return {"error": f"Error from LLM API: {error_text}", "timings": timings}
             
-            try:
-                async with session.post(f"{self.ollama_url}/api/chat", json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        return {"error": f"Error from LLM API: {error_text}"}
-                    
-                    if stream:
-                        # For streaming, just return the response object
-                        return {"stream": response}
-                    else:
-                        # For non-streaming, parse the JSON response
-                        completion = await response.json()
-                        return completion
-            except Exception as e:
-                logger.error(f"Error calling LLM API: {str(e)}")
-                return {"error": f"Failed to communicate with LLM: {str(e)}"}
+            if stream:
+                # The caller reads the body, then releases it with finish_stream()
+                return {"stream": response, "timings": timings, "started": started}
+            
+            # For non-streaming, parse the JSON response
+            completion = await response.json()
+            await response.release()
+            completion["timings"] = self._finish_call(timings, started)
+            return completion
+        except Exception as e:
+            if response is not None:
+                await response.release()
+            self._finish_call(timings, started, error=True)
+            logger.error(f"Error calling LLM API: {str(e)}")
+            return {"error": f"Failed to communicate with LLM: {str(e)}", "timings": timings}
+    
+    async def finish_stream(self, completion: Dict[str, Any]) -> Dict[str, Any]:
+        """Release a streaming completion's connection back to the pool and record its timings"""
+        if not completion.get("finished"):
+            completion["finished"] = True
+            await completion["stream"].release()
+            self._finish_call(completion["timings"], completion["started"])
+        return completion["timings"]
 
     async def generate_response(self, 
                                user_query: str, 
@@ -339,6 +469,8 @@ Also, do not reveal the names of the tools you are using to the user.
         # Get initial response
         start_time = datetime.now()
         response = await self.get_completion(messages)
+        # Connect / first-byte / total timings of each LLM call in this turn
+        llm_calls = [response.get("timings")]
         
         if "error" in response:
             error_message = {
@@ -346,10 +478,11 @@ Also, do not reveal the names of the tools you are using to the user.
                 "content": f"I'm sorry, I encountered an error: {response['error']}. Please try rephrasing your question.",
                 "metadata": {
                     "query_time": (datetime.now() - start_time).total_seconds(),
-                    "tools_used": []
+                    "tools_used": [],
+                    "llm_calls": llm_calls
                 }
             }
-            await log_chat(session_id, user_query, error_message["content"])
+            chat_log.record(session_id, user_query, error_message["content"])
             return error_message
             
         message = response.get("message", {})
@@ -364,9 +497,10 @@ Also, do not reveal the names of the tools you are using to the user.
             if not message.get("metadata"):
                 message["metadata"] = {
                     "query_time": (datetime.now() - start_time).total_seconds(),
-                    "tools_used": []
+                    "tools_used": [],
+                    "llm_calls": llm_calls
                 }
-            await log_chat(session_id, user_query, message.get("content", ""))
+            chat_log.record(session_id, user_query, message.get("content", ""))
             return message
         
         # Handle tool calls
@@ -384,6 +518,7 @@ Also, do not reveal the names of the tools you are using to the user.
         
         # Get final response with tool results
         final_response = await self.get_completion(messages)
+        llm_calls.append(final_response.get("timings"))
         
         if "error" in final_response:
             error_message = {
@@ -391,10 +526,11 @@ Also, do not reveal the names of the tools you are using to the user.
                 "content": f"I'm sorry, I encountered an error: {final_response['error']}. Please try rephrasing your question.",
                 "metadata": {
                     "query_time": (datetime.now() - start_time).total_seconds(),
-                    "tools_used": tools_used
+                    "tools_used": tools_used,
+                    "llm_calls": llm_calls
                 }
             }
-            await log_chat(session_id, user_query, error_message["content"], tools_used)
+            chat_log.record(session_id, user_query, error_message["content"], tools_used)
             return error_message
         
         final_message = final_response.get("message", {})
@@ -405,11 +541,12 @@ Also, do not reveal the names of the tools you are using to the user.
         # Add metadata for frontend
         final_message["metadata"] = {
             "query_time": query_time,
-            "tools_used": tools_used
+            "tools_used": tools_used,
+            "llm_calls": llm_calls
         }
         
-        # Log the interaction
-        await log_chat(session_id, user_query, final_message.get("content", ""), tools_used)
+        # Log the interaction (written in the background)
+        chat_log.record(session_id, user_query, final_message.get("content", ""), tools_used)
         
         return final_message
     
@@ -470,60 +607,61 @@ Also, do not reveal the names of the tools you are using to the user.
             yield {"role": "assistant", "content": "Failed to initialize streaming response"}
             return
         
-        # Process the stream
+        # Ollama streams newline-delimited JSON chunks
         response_stream = response["stream"]
         buffer = ""
         
         try:
             async for line in response_stream.content:
                 line = line.decode('utf-8').strip()
+                # Tolerate server-sent-event framing from OpenAI-style proxies
                 if line.startswith('data: '):
-                    data = line[6:]  # Remove 'data: ' prefix
-                    if data == '[DONE]':
-                        break
-                    
-                    try:
-                        chunk = json.loads(data)
-                        
-                        # Check for tool calls
-                        if 'message' in chunk:
-                            message = chunk['message']
-                            
-                            # If we have tool calls, stop streaming and use the non-streaming approach
-                            if 'tool_calls' in message:
-                                # Close stream
-                                await response_stream.release()
-                                
-                                # Use non-streaming approach
-                                full_response = await self.generate_response(user_query, history, session_id)
-                                yield full_response
-                                return
-                            
-                            # Add content to buffer
-                            if 'content' in message and message['content']:
-                                buffer += message['content']
-                                yield {"role": "assistant", "content": buffer, "streaming": True}
-                    except json.JSONDecodeError:
-                        pass
+                    line = line[6:]
+                if not line or line == '[DONE]':
+                    continue
+                
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                
+                message = chunk.get('message') or {}
+                
+                # If we have tool calls, stop streaming and use the non-streaming approach
+                if message.get('tool_calls'):
+                    await self.finish_stream(response)
+                    full_response = await self.generate_response(user_query, history, session_id)
+                    yield full_response
+                    return
+                
+                # Add content to buffer
+                if message.get('content'):
+                    buffer += message['content']
+                    yield {"role": "assistant", "content": buffer, "streaming": True}
+                
+                if chunk.get('done'):
+                    break
         
         except Exception as e:
             logger.error(f"Error in streaming response: {str(e)}")
             yield {"role": "assistant", "content": f"Error during streaming: {str(e)}"}
         finally:
-            # Ensure stream is closed
-            await response_stream.release()
+            # Return the connection to the pool (no-op if already released)
+            timings = await self.finish_stream(response)
         
-        # Log the completed interaction
-        await log_chat(session_id, user_query, buffer)
+        # Log the completed interaction (written in the background)
+        chat_log.record(session_id, user_query, buffer)
         
         # Return the final complete message
-        yield {"role": "assistant", "content": buffer, "streaming": False}
+        yield {"role": "assistant", "content": buffer, "streaming": False, "metadata": {"llm_calls": [timings]}}
 
 async def test_agent():
     """Test the agent with a sample query"""
     agent = Agent()
     response = await agent.generate_response("What are the latest executive orders?")
     print(json.dumps(response, indent=2))
+    await agent.close()
+    await chat_log.close()
 
 if __name__ == "__main__":
     asyncio.run(test_agent()) 
\ No newline at end of file
@@ -18,8 +18,14 @@ import uvicorn
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agent.agent import Agent
-from db_connector import get_database_stats, query_documents
+from db_backend import (
+    get_database_stats, init_pool, close_pool, get_pool_stats,
+    chat_log, get_chat_log_stats
+)
+from db_common import get_query_cache_stats
+from query_stats import get_query_stats
 from pipeline.main import run_single_day
+from search.hybrid import get_keyword_index, keyword_search, hybrid_search, search_documents_page
 
 # Configure logging
 logging.basicConfig(
@@ -50,6 +56,33 @@ templates = Jinja2Templates(directory="static")
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+@app.on_event("startup")
+async def startup():
+    """Open the shared database connection pool"""
+    try:
+        await init_pool()
+    except Exception as e:
+        # The pool is created lazily on first use if the database is not up yet
+        logger.error(f"Error creating database pool: {str(e)}")
+        return
+    
+    # Build the keyword index in the background so the first search does not wait for it
+    asyncio.create_task(warm_keyword_index())
+
+async def warm_keyword_index():
+    try:
+        await get_keyword_index()
+    except Exception as e:
+        logger.error(f"Error building keyword index: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the LLM session, flush queued chat logs and close the shared database connection pool"""
+    if _agent is not None:
+        await _agent.close()
+    await chat_log.close()
+    await close_pool()
+
 # Initialize agent (lazy loading)
 _agent = None
 
@@ -110,6 +143,76 @@ async def get_stats():
     stats = await get_database_stats()
     return stats
 
+@app.get("/api/documents")
+async def list_documents(
+    keywords: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+):
+    """Page through documents newest first; pass next_cursor back as cursor for the next page"""
+    try:
+        return await search_documents_page(keywords, document_type, start_date, end_date, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
+
+@app.get("/api/search")
+async def search(
+    q: str,
+    mode: str = "hybrid",
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0
+):
+    """Relevance-ranked search: BM25 keyword ranking, or BM25 fused with vector similarity"""
+    if mode not in ("hybrid", "bm25"):
+        raise HTTPException(status_code=400, detail="mode must be 'hybrid' or 'bm25'")
+    search_function = hybrid_search if mode == "hybrid" else keyword_search
+    try:
+        documents = await search_function(q, max(1, min(limit, 100)), document_type, start_date, end_date, max(0, offset))
+        return {"documents": documents}
+    except Exception as e:
+        logger.error(f"Error searching documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching documents: {str(e)}")
+
+@app.get("/api/database/pool")
+async def get_pool_status():
+    """Get connection pool usage (size, in-use connections, acquire wait times)"""
+    return get_pool_stats()
+
+@app.get("/api/database/cache")
+async def get_cache_status():
+    """Get query result cache counters (hits, misses, evictions, generation)"""
+    return get_query_cache_stats()
+
+@app.get("/api/database/chat-log")
+async def get_chat_log_status():
+    """Get chat log buffer counters (pending, written, dropped, failed)"""
+    return get_chat_log_stats()
+
+@app.get("/api/database/queries")
+async def get_query_report(limit: int = 10, sort: str = "total_ms"):
+    """Get the slowest statement fingerprints with timings and captured EXPLAIN plans
+    
+    sort is one of total_ms, max_ms, avg_ms, count or slow.
+    """
+    try:
+        return get_query_stats(max(1, min(limit, 100)), sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/agent/http")
+async def get_agent_http_status():
+    """Get LLM call counters (connections opened vs reused, first-byte and total times)"""
+    return get_agent().get_http_stats()
+
 @app.get("/api/database/update")
 async def update_database(date: Optional[str] = None):
     """Trigger a database update for a specific date"""
@@ -0,0 +1,217 @@
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+
+from db_common import (
+    MAX_PAGE_SIZE, query_cache, _query_cache_key, _copy_documents, encode_cursor
+)
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger("db_backend")
+
+# Storage backend: "mysql" (default, db_connector) or "sqlite" (the embedded database in db_sqlite)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+
+if DB_BACKEND == "sqlite":
+    import db_sqlite as backend
+elif DB_BACKEND == "mysql":
+    import db_connector as backend
+else:
+    raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+
+# The storage contract every backend module implements
+init_pool = backend.init_pool
+close_pool = backend.close_pool
+get_pool_stats = backend.get_pool_stats
+init_db = backend.init_db
+analyze_tables = backend.analyze_tables
+partition_documents = backend.partition_documents
+archive_documents_partition = backend.archive_documents_partition
+insert_documents = backend.insert_documents
+iter_documents = backend.iter_documents
+supports_keyword_filter = backend.supports_keyword_filter
+get_documents_by_ids = backend.get_documents_by_ids
+get_embedding_candidates = backend.get_embedding_candidates
+replace_embeddings = backend.replace_embeddings
+iter_documents_for_index = backend.iter_documents_for_index
+iter_document_deletions = backend.iter_document_deletions
+iter_embeddings = backend.iter_embeddings
+rebuild_stats = backend.rebuild_stats
+get_database_stats = backend.get_database_stats
+log_chat = backend.log_chat
+log_chats = backend.log_chats
+
+async def query_documents(
+    keywords: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 10
+) -> List[Dict[str, Any]]:
+    """Query documents from the database based on criteria
+    
+    Results are served from the query cache when the same search was run
+    recently and nothing has been ingested since.
+    """
+    key = _query_cache_key("documents", keywords, document_type, start_date, end_date, limit)
+    cached = query_cache.get(key)
+    if cached is not None:
+        return _copy_documents(cached)
+    
+    try:
+        generation = query_cache.generation
+        documents = [
+            doc async for doc in iter_documents(keywords, document_type, start_date, end_date, limit=limit)
+        ]
+        query_cache.put(key, documents, generation)
+        return _copy_documents(documents)
+    
+    except Exception as e:
+        logger.error(f"Error querying documents: {str(e)}")
+        return []
+
+async def query_documents_page(
+    keywords: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 10
+) -> Dict[str, Any]:
+    """One keyset page of documents plus the cursor for the next page
+    
+    `next_cursor` is None on the last page. Raises ValueError for a
+    malformed cursor, or for keywords the backend cannot filter by (see
+    supports_keyword_filter; search.hybrid.search_documents_page handles
+    those). Pages are cached like query_documents results.
+    """
+    limit = max(1, min(int(limit or 10), MAX_PAGE_SIZE))
+    key = _query_cache_key("page", keywords, document_type, start_date, end_date, limit, cursor)
+    cached = query_cache.get(key)
+    if cached is not None:
+        return {"documents": _copy_documents(cached["documents"]), "next_cursor": cached["next_cursor"]}
+    generation = query_cache.generation
+    
+    # One extra row tells whether another page exists
+    documents = [
+        doc async for doc in iter_documents(
+            keywords, document_type, start_date, end_date, after=cursor, limit=limit + 1
+        )
+    ]
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last["publication_date"], last["id"])
+    
+    query_cache.put(key, {"documents": documents, "next_cursor": next_cursor}, generation)
+    return {"documents": _copy_documents(documents), "next_cursor": next_cursor}
+
+# Chat log write-behind settings
+CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", 1000))
+CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", 50))
+CHAT_LOG_FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", 2))
+
+class ChatLogBuffer:
+    """Write-behind buffer that takes chat logging off the response path
+    
+    record() only queues the interaction; a background task writes queued
+    records with log_chats once `batch_size` are waiting or every
+    `flush_interval` seconds. When `max_pending` records are already queued
+    (the database is down or slow), new records are dropped and counted
+    rather than growing memory. close() writes whatever is left.
+    """
+    
+    def __init__(
+        self,
+        max_pending: int = CHAT_LOG_QUEUE_SIZE,
+        batch_size: int = CHAT_LOG_BATCH_SIZE,
+        flush_interval: float = CHAT_LOG_FLUSH_INTERVAL
+    ):
+        self.max_pending = max_pending
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self._pending: "deque[Tuple[str, str, str, Optional[str]]]" = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closing = False
+    
+    def record(self, session_id: str, query: str, response: str, tools_used: Optional[List[str]] = None) -> bool:
+        """Queue a chat interaction; returns False if it was dropped"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append((session_id, query, response, json.dumps(tools_used) if tools_used else None))
+        self.queued += 1
+        self._start_writer()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+    
+    def _start_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+    
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def flush(self) -> None:
+        """Write every queued record in batches of `batch_size`"""
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self.flushes += 1
+            if await log_chats(batch):
+                self.written += len(batch)
+            else:
+                self.failed += len(batch)
+    
+    async def close(self) -> None:
+        """Stop the writer after flushing queued records"""
+        task = self._task
+        if task is not None and not task.done() and self._loop is asyncio.get_running_loop():
+            self._closing = True
+            self._wakeup.set()
+            await task
+        self._task = None
+        self._closing = False
+        await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes
+        }
+
+chat_log = ChatLogBuffer()
+
+def get_chat_log_stats() -> Dict[str, Any]:
+    """Chat log buffer counters for monitoring"""
+    return chat_log.stats()
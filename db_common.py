@@ -0,0 +1,194 @@
+import os
+import json
+import base64
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Number of documents sent per multi-row upsert
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", 500))
+
+def standardize_document_type(doc_type, title=""):
+    """Standardize document types to ensure consistency"""
+    if not doc_type or doc_type.lower() == "null" or doc_type.lower() == "none" or doc_type.lower() == "unspecified":
+        # Try to infer from title
+        title = title.lower()
+        if "executive order" in title or title.startswith("eo"):
+            return "executive_order"
+        elif "notice" in title:
+            return "notice"
+        elif "proposed rule" in title:
+            return "proposed_rule"
+        elif "rule" in title:
+            return "rule"
+        elif "presidential" in title:
+            return "presidential_document"
+        else:
+            return "unspecified"
+    
+    # Standardize known variations
+    doc_type = doc_type.lower()
+    if doc_type in ["executive_order", "eo", "executive order", "e.o."]:
+        return "executive_order"
+    elif doc_type in ["notice", "notices"]:
+        return "notice"
+    elif doc_type in ["proposed_rule", "proposed rule", "proposed rules"]:
+        return "proposed_rule"
+    elif doc_type in ["rule", "rules", "final rule"]:
+        return "rule"
+    elif doc_type in ["presidential_document", "presidential document", "presidential documents"]:
+        return "presidential_document"
+    else:
+        return doc_type
+
+def canonical_document_type(doc: Dict[str, Any]) -> str:
+    """Canonical document type stored for a document
+    
+    The API reports the type in `type` ("Rule", "Presidential Document", ...)
+    and executive orders in `subtype`; these win over a previously derived
+    document_type, and the title is only consulted when none are set.
+    """
+    if "executive order" in (doc.get("subtype") or "").lower():
+        doc_type = "executive_order"
+    else:
+        doc_type = doc.get("type") or doc.get("document_type")
+    return standardize_document_type(doc_type, doc.get("title") or "")
+
+# Columns covered by a document's content hash
+HASHED_COLUMNS = [
+    "document_number", "title", "publication_date", "document_type",
+    "abstract", "html_url", "pdf_url", "type", "subtype"
+]
+
+UPSERT_COLUMNS = HASHED_COLUMNS + ["content_hash"]
+
+def compute_content_hash(doc: Dict[str, Any]) -> str:
+    """SHA-256 over the stored columns of a document
+    
+    The document type is canonicalized first, so the hash is the same whether
+    it is computed during processing or at insert time.
+    """
+    values = dict(doc)
+    values["document_type"] = canonical_document_type(doc)
+    canonical = json.dumps([values.get(column) for column in HASHED_COLUMNS], ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _add_stats_delta(deltas: Dict[str, Dict[str, Any]], doc_type: str, count: int, publication_date=None) -> None:
+    """Accumulate a per-type change to the document_stats rollup"""
+    delta = deltas.setdefault(doc_type, {"count": 0, "min": None, "max": None})
+    delta["count"] += count
+    if publication_date:
+        publication_date = str(publication_date)
+        delta["min"] = min(delta["min"] or publication_date, publication_date)
+        delta["max"] = max(delta["max"] or publication_date, publication_date)
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# Query result cache settings
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 256))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 300))
+
+class QueryCache:
+    """In-process LRU cache of query results with a TTL
+    
+    Every successful ingest in this process bumps `generation` and drops all
+    entries. A result is only stored if no ingest happened while it was being
+    queried, so a slow query cannot re-insert pre-ingest rows. Ingests run by
+    other processes (the pipeline CLI) are covered by the TTL.
+    """
+    
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: Tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key: Tuple, value: Any, generation: int) -> None:
+        if self.max_size <= 0 or generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+query_cache = QueryCache()
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    """Query result cache counters for monitoring"""
+    return query_cache.stats()
+
+def _query_cache_key(kind: str, keywords, document_type, start_date, end_date, limit, cursor=None) -> Tuple:
+    """Normalize query criteria so equivalent searches share a cache entry"""
+    keywords = " ".join(keywords.lower().split()) if keywords else None
+    document_type = standardize_document_type(document_type) if document_type else None
+    return (kind, keywords or None, document_type, start_date or None, end_date or None, int(limit or 0), cursor or None)
+
+def _copy_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Cached rows are shared between callers, so each caller gets its own dicts
+    return [dict(doc) for doc in documents]
+
+# Upper bound on documents returned by one page of query_documents_page
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+
+def encode_cursor(publication_date: str, doc_id: int) -> str:
+    """Opaque keyset cursor for the row a page ended on"""
+    return base64.urlsafe_b64encode(f"{publication_date}|{doc_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        publication_date, doc_id = raw.split("|")
+        datetime.strptime(publication_date, "%Y-%m-%d")
+        return publication_date, int(doc_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
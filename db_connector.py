@@ -1,11 +1,22 @@
 import os
 import json
 import asyncio
-from typing import List, Dict, Any, Optional
+import struct
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 import aiomysql
 from dotenv import load_dotenv
 import logging
 
+from db_common import (
+    DB_BATCH_SIZE, HASHED_COLUMNS, UPSERT_COLUMNS,
+    canonical_document_type, compute_content_hash, standardize_document_type,
+    decode_cursor, query_cache, _add_stats_delta, _chunks
+)
+from query_stats import TimedDictCursor, TimedSSDictCursor
+
 # Load environment variables
 load_dotenv()
 
@@ -24,132 +35,716 @@ DB_CONFIG = {
     "password": os.getenv("MYSQL_PASSWORD", "password"),
     "db": os.getenv("MYSQL_DATABASE", "federal_register"),
     "charset": "utf8mb4",
-    "cursorclass": aiomysql.DictCursor
+    # Records every statement's timing (and slow statements' plans) in query_stats
+    "cursorclass": TimedDictCursor
+}
+
+# Shared connection pool settings
+POOL_CONFIG = {
+    "minsize": int(os.getenv("MYSQL_POOL_MINSIZE", 1)),
+    "maxsize": int(os.getenv("MYSQL_POOL_MAXSIZE", 10)),
+    # Seconds after which idle connections are replaced (-1 disables)
+    "pool_recycle": int(os.getenv("MYSQL_POOL_RECYCLE", 3600)),
+    # Pooled connections are long-lived, so reads must not keep an old transaction snapshot open
+    "autocommit": True
+}
+
+# One pool per process, created lazily or by init_pool() at app startup
+_pool = None
+_pool_loop = None
+_pool_lock = None
+_pool_stats = {
+    "acquires": 0,
+    "in_use": 0,
+    "acquire_wait_total": 0.0,
+    "acquire_wait_max": 0.0
 }
 
+async def init_pool():
+    """Create the process-wide connection pool if it does not exist yet"""
+    global _pool, _pool_loop, _pool_lock
+    loop = asyncio.get_running_loop()
+    
+    # A pool is bound to the event loop that created it
+    if _pool is not None and _pool_loop is not loop:
+        _pool = None
+    if _pool_lock is None or _pool_loop is not loop:
+        _pool_lock = asyncio.Lock()
+        _pool_loop = loop
+    
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(**DB_CONFIG, **POOL_CONFIG)
+            logger.info(
+                f"Created MySQL connection pool (min {POOL_CONFIG['minsize']}, max {POOL_CONFIG['maxsize']}, "
+                f"recycle {POOL_CONFIG['pool_recycle']}s)"
+            )
+    return _pool
+
 async def get_pool():
-    """Get a connection pool to the MySQL database"""
-    return await aiomysql.create_pool(**DB_CONFIG)
+    """Get the shared connection pool to the MySQL database"""
+    if _pool is not None and _pool_loop is asyncio.get_running_loop():
+        return _pool
+    return await init_pool()
+
+async def close_pool() -> None:
+    """Close the process-wide connection pool (app shutdown / end of a pipeline run)"""
+    global _pool
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
+    pool.close()
+    await pool.wait_closed()
+    logger.info("Closed MySQL connection pool")
+
+@asynccontextmanager
+async def acquire():
+    """Acquire a connection from the shared pool, tracking wait time and usage"""
+    pool = await get_pool()
+    started = time.perf_counter()
+    async with pool.acquire() as conn:
+        waited = time.perf_counter() - started
+        _pool_stats["acquires"] += 1
+        _pool_stats["acquire_wait_total"] += waited
+        _pool_stats["acquire_wait_max"] = max(_pool_stats["acquire_wait_max"], waited)
+        _pool_stats["in_use"] += 1
+        try:
+            yield conn
+        finally:
+            _pool_stats["in_use"] -= 1
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Connection pool usage for monitoring"""
+    acquires = _pool_stats["acquires"]
+    return {
+        "backend": "mysql",
+        "initialized": _pool is not None,
+        "size": _pool.size if _pool is not None else 0,
+        "free": _pool.freesize if _pool is not None else 0,
+        "in_use": _pool_stats["in_use"],
+        "minsize": POOL_CONFIG["minsize"],
+        "maxsize": POOL_CONFIG["maxsize"],
+        "pool_recycle": POOL_CONFIG["pool_recycle"],
+        "acquires": acquires,
+        "acquire_wait_avg_ms": round(_pool_stats["acquire_wait_total"] / acquires * 1000, 3) if acquires else 0.0,
+        "acquire_wait_max_ms": round(_pool_stats["acquire_wait_max"] * 1000, 3)
+    }
+
+def split_sql_statements(sql: str) -> List[str]:
+    """Split a SQL script into statements, honouring mysql-client DELIMITER lines
+    
+    Full-line "--" comments are dropped, so a semicolon in a comment never
+    ends a statement; stored routines must be wrapped in DELIMITER lines as
+    they would be for the mysql client.
+    """
+    statements = []
+    delimiter = ";"
+    lines: List[str] = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("--"):
+            continue
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        lines.append(line)
+        if stripped.endswith(delimiter):
+            lines[-1] = line.rstrip()[:-len(delimiter)]
+            statement = "\n".join(lines).strip()
+            if statement:
+                statements.append(statement)
+            lines = []
+    statement = "\n".join(lines).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+async def _column_exists(cur, table: str, column: str) -> bool:
+    await cur.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    return (await cur.fetchone())["count"] > 0
+
+async def _index_exists(cur, table: str, index: str) -> bool:
+    await cur.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index)
+    )
+    return (await cur.fetchone())["count"] > 0
+
+async def _add_column(cur, table: str, column: str, definition: str) -> None:
+    if not await _column_exists(cur, table, column):
+        logger.info(f"Adding column {table}.{column}")
+        await cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+async def _add_index(cur, table: str, index: str, columns: str) -> None:
+    if not await _index_exists(cur, table, index):
+        logger.info(f"Adding index {table}.{index}")
+        await cur.execute(f"ALTER TABLE {table} ADD INDEX {index} {columns}")
+
+# Migrations must be idempotent: databases that predate schema_migrations
+# run all of them once, including steps their tables already reflect.
+
+# The schema of the first release, frozen so that version 1 means the same
+# tables on every database. Never edit it; later migrations carry the schema
+# forward (federal-schema.sql shows the result for manual setup).
+BASELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    document_number VARCHAR(50) UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    publication_date DATE,
+    document_type VARCHAR(50),
+    abstract TEXT,
+    html_url VARCHAR(255),
+    pdf_url VARCHAR(255),
+    type VARCHAR(100),
+    subtype VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FULLTEXT(title, abstract)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS pipeline_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    run_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    start_date DATE,
+    end_date DATE,
+    documents_added INT DEFAULT 0,
+    documents_updated INT DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS chat_history (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    session_id VARCHAR(50) NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    tools_used JSON,
+    query_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX(session_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS vector_embeddings (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    document_id INT NOT NULL,
+    chunk_index INT NOT NULL DEFAULT 0,
+    chunk_text TEXT NOT NULL,
+    embedding_vector JSON,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE,
+    INDEX(document_id, chunk_index)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+async def _migrate_baseline(cur) -> None:
+    for statement in split_sql_statements(BASELINE_SCHEMA):
+        await cur.execute(statement)
+
+async def _migrate_content_hash(cur) -> None:
+    await _add_column(cur, "documents", "content_hash", "CHAR(64) NULL AFTER subtype")
+
+async def _migrate_document_types(cur) -> None:
+    # Databases without the type index predate write-time type canonicalization
+    if not await _index_exists(cur, "documents", "idx_documents_type_date"):
+        await backfill_document_types(cur)
+    await _add_index(cur, "documents", "idx_documents_type_date", "(document_type, publication_date)")
+    await _add_index(cur, "documents", "idx_documents_date", "(publication_date)")
+
+async def _migrate_document_stats(cur) -> None:
+    await cur.execute("""
+    CREATE TABLE IF NOT EXISTS document_stats (
+        document_type VARCHAR(50) PRIMARY KEY,
+        document_count INT NOT NULL DEFAULT 0,
+        min_publication_date DATE,
+        max_publication_date DATE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    await cur.execute("SELECT EXISTS(SELECT 1 FROM documents) AS has_documents")
+    if (await cur.fetchone())["has_documents"]:
+        await _rebuild_stats(cur)
+
+async def _migrate_embedding_blobs(cur) -> None:
+    await _add_column(cur, "vector_embeddings", "embedding", "BLOB NULL AFTER chunk_text")
+    await _add_column(cur, "vector_embeddings", "source_hash", "CHAR(64) NULL AFTER embedding")
+    await migrate_embedding_vectors(cur)
+
+async def _migrate_updated_at(cur) -> None:
+    await _add_column(
+        cur, "documents", "updated_at",
+        "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP AFTER created_at"
+    )
+    await _add_index(cur, "documents", "idx_documents_updated", "(updated_at)")
+
+async def _migrate_ingest_index(cur) -> None:
+    await _add_index(
+        cur, "documents", "idx_documents_number_hash",
+        "(document_number, content_hash, document_type, publication_date)"
+    )
+
+async def _migrate_document_deletions(cur) -> None:
+    await cur.execute("""
+    CREATE TABLE IF NOT EXISTS document_deletions (
+        document_id INT NOT NULL,
+        deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_document_deletions_deleted (deleted_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+async def _migrate_drop_vector_search(cur) -> None:
+    # Placeholder procedure from the original schema file; search runs in-process
+    await cur.execute("DROP PROCEDURE IF EXISTS vector_search")
+
+# Applied in order and recorded in schema_migrations; append new versions, never renumber
+MIGRATIONS = [
+    (1, "baseline schema", _migrate_baseline),
+    (2, "documents.content_hash", _migrate_content_hash),
+    (3, "canonical document types and date indexes", _migrate_document_types),
+    (4, "document_stats rollup", _migrate_document_stats),
+    (5, "float32 embedding BLOBs", _migrate_embedding_blobs),
+    (6, "documents.updated_at", _migrate_updated_at),
+    (7, "ingest change-detection index", _migrate_ingest_index),
+    (8, "document_deletions log", _migrate_document_deletions),
+    (9, "drop vector_search placeholder procedure", _migrate_drop_vector_search),
+]
+
+# Seconds to wait for another process that is applying migrations
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", 300))
+
+async def _schema_version(cur) -> int:
+    await cur.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'schema_migrations'"
+    )
+    if (await cur.fetchone())["count"] == 0:
+        return 0
+    await cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+    return (await cur.fetchone())["version"]
+
+async def migrate(cur) -> int:
+    """Apply pending migrations in order; returns how many were applied
+    
+    A MySQL named lock serializes processes starting at the same time, so
+    each migration runs exactly once per database.
+    """
+    latest = MIGRATIONS[-1][0]
+    if await _schema_version(cur) >= latest:
+        return 0
+    
+    await cur.execute("SELECT GET_LOCK('federal_register_migrations', %s) AS locked", (MIGRATION_LOCK_TIMEOUT,))
+    if not (await cur.fetchone())["locked"]:
+        raise RuntimeError("Timed out waiting for another process to apply schema migrations")
+    applied = 0
+    try:
+        await cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        version = await _schema_version(cur)
+        for number, name, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info(f"Applying schema migration {number}: {name}")
+            await migration(cur)
+            await cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (number, name))
+            applied += 1
+    finally:
+        await cur.execute("SELECT RELEASE_LOCK('federal_register_migrations')")
+        await cur.fetchone()
+    return applied
+
+def pack_vector(vector) -> bytes:
+    """Pack an embedding as little-endian float32 for the vector_embeddings.embedding BLOB"""
+    return struct.pack(f"<{len(vector)}f", *vector)
+
+async def migrate_embedding_vectors(cur, batch_size: Optional[int] = None) -> None:
+    """Convert JSON embedding_vector values to packed float32 BLOBs and drop the JSON column"""
+    await cur.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'vector_embeddings' AND COLUMN_NAME = 'embedding_vector'"
+    )
+    if (await cur.fetchone())["count"] == 0:
+        return
+    
+    batch_size = batch_size or DB_BATCH_SIZE
+    converted = 0
+    last_id = 0
+    while True:
+        await cur.execute(
+            "SELECT id, embedding_vector FROM vector_embeddings WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = await cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        changes = [
+            (pack_vector(json.loads(row["embedding_vector"])), row["id"])
+            for row in rows if row["embedding_vector"]
+        ]
+        if changes:
+            await cur.executemany("UPDATE vector_embeddings SET embedding = %s WHERE id = %s", changes)
+            converted += len(changes)
+    
+    await cur.execute("ALTER TABLE vector_embeddings DROP COLUMN embedding_vector")
+    logger.info(f"Converted {converted} JSON embeddings to float32 BLOBs")
+
+async def backfill_document_types(cur, batch_size: Optional[int] = None) -> int:
+    """Rewrite stored document types (and content hashes) in canonical form"""
+    batch_size = batch_size or DB_BATCH_SIZE
+    updated = 0
+    last_id = 0
+    while True:
+        await cur.execute(
+            f"SELECT id, {', '.join(HASHED_COLUMNS)}, content_hash FROM documents "
+            f"WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = await cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        
+        changes = []
+        for row in rows:
+            doc_type = canonical_document_type(row)
+            if doc_type != row["document_type"]:
+                row["document_type"] = doc_type
+                changes.append((doc_type, compute_content_hash(row), row["id"]))
+        if changes:
+            await cur.executemany(
+                "UPDATE documents SET document_type = %s, content_hash = %s WHERE id = %s",
+                changes
+            )
+            updated += len(changes)
+    
+    logger.info(f"Backfilled canonical document types for {updated} documents")
+    return updated
+
+# init_db checks the schema once per process
+_schema_ready = False
 
 async def init_db():
-    """Initialize the database schema if it doesn't exist"""
+    """Apply pending schema migrations
+    
+    Runs the migration check once per process; later calls return at once.
+    Table statistics are refreshed separately with analyze_tables().
+    """
+    global _schema_ready
+    if _schema_ready:
+        return True
+    try:
+        async with acquire() as conn:
+            async with conn.cursor() as cur:
+                applied = await migrate(cur)
+                if await _documents_partitioned(cur):
+                    await ensure_documents_partitions(cur)
+        
+        _schema_ready = True
+        logger.info(f"Database initialized successfully ({applied} migrations applied)")
+        return True
+    except Exception as e:
+        logger.error(f"Error initializing database: {str(e)}")
+        return False
+
+async def analyze_tables() -> bool:
+    """Refresh optimizer statistics (ANALYZE TABLE); run after large ingests"""
+    try:
+        async with acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("ANALYZE TABLE documents, document_stats, vector_embeddings, chat_history")
+                for row in await cur.fetchall():
+                    logger.info(f"{row['Table']}: {row['Msg_type']} {row['Msg_text']}")
+        return True
+    except Exception as e:
+        logger.error(f"Error analyzing tables: {str(e)}")
+        return False
+
+# Yearly documents partitions are kept this many years past the current one
+PARTITION_YEARS_AHEAD = int(os.getenv("PARTITION_YEARS_AHEAD", 1))
+
+_partitioned: Optional[bool] = None
+
+async def _documents_partitioned(cur) -> bool:
+    global _partitioned
+    if _partitioned is None:
+        await cur.execute(
+            "SELECT COUNT(*) AS count FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'documents' AND PARTITION_NAME IS NOT NULL"
+        )
+        _partitioned = (await cur.fetchone())["count"] > 0
+    return _partitioned
+
+async def documents_partitioned() -> bool:
+    """Whether partition_documents() has been applied to this database"""
+    if _partitioned is None:
+        async with acquire() as conn:
+            async with conn.cursor() as cur:
+                await _documents_partitioned(cur)
+    return _partitioned
+
+async def supports_keyword_filter() -> bool:
+    """Whether iter_documents can filter by keywords (FULLTEXT is lost once partitioned)"""
+    return not await documents_partitioned()
+
+def _year_partition(year: int) -> str:
+    return f"PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')"
+
+async def partition_documents() -> bool:
+    """Range-partition documents by publication_date into yearly partitions (opt-in)
+    
+    Date-bounded queries then only read the partitions they cover, and a
+    whole year can be archived with archive_documents_partition(). MySQL
+    only partitions tables without FULLTEXT indexes or foreign keys, and
+    every unique key must include publication_date, so the migration:
+    
+    - drops the FULLTEXT index (keyword search is served by the in-process
+      BM25 index; the database fallback becomes a LIKE scan),
+    - drops the vector_embeddings foreign key (embeddings are deleted
+      explicitly by insert_documents and archiving instead of by cascade),
+    - makes publication_date NOT NULL (missing dates take the created_at
+      date) and the keys (id, publication_date) and
+      (document_number, publication_date).
+    
+    It rewrites the table, so run it during a maintenance window.
+    """
+    global _partitioned
     try:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
+        async with acquire() as conn:
             async with conn.cursor() as cur:
-                # Read schema file and execute
-                with open('federal-schema.sql', 'r') as f:
-                    schema = f.read()
+                if await _documents_partitioned(cur):
+                    logger.info("Documents table is already partitioned")
+                    return True
                 
-                # Split by semicolon to execute multiple statements
-                statements = schema.split(';')
-                for statement in statements:
-                    if statement.strip():
-                        await cur.execute(statement)
-                await conn.commit()
+                await cur.execute(
+                    "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+                    "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'vector_embeddings' "
+                    "AND REFERENCED_TABLE_NAME = 'documents'"
+                )
+                for row in await cur.fetchall():
+                    await cur.execute(f"ALTER TABLE vector_embeddings DROP FOREIGN KEY `{row['CONSTRAINT_NAME']}`")
                 
-        logger.info("Database initialized successfully")
-        pool.close()
-        await pool.wait_closed()
+                await cur.execute(
+                    "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'documents' "
+                    "AND (INDEX_TYPE = 'FULLTEXT' OR (NON_UNIQUE = 0 AND INDEX_NAME <> 'PRIMARY'))"
+                )
+                drops = [f"DROP INDEX `{row['INDEX_NAME']}`" for row in await cur.fetchall()]
+                
+                await cur.execute("UPDATE documents SET publication_date = DATE(created_at) WHERE publication_date IS NULL")
+                await cur.execute("SELECT YEAR(MIN(publication_date)) AS first_year FROM documents")
+                first_year = (await cur.fetchone())["first_year"] or datetime.now().year
+                
+                logger.info("Rebuilding documents keys for partitioning")
+                await cur.execute(
+                    f"ALTER TABLE documents {', '.join(drops + [''])}"
+                    "MODIFY publication_date DATE NOT NULL, "
+                    "DROP PRIMARY KEY, ADD PRIMARY KEY (id, publication_date), "
+                    "ADD UNIQUE INDEX uq_documents_number_date (document_number, publication_date)"
+                )
+                
+                years = range(first_year, datetime.now().year + PARTITION_YEARS_AHEAD + 1)
+                logger.info(f"Partitioning documents by year from {first_year}")
+                await cur.execute(
+                    "ALTER TABLE documents PARTITION BY RANGE COLUMNS (publication_date) ("
+                    + ", ".join([_year_partition(year) for year in years] + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+                    + ")"
+                )
+                _partitioned = True
+        
+        query_cache.invalidate()
+        logger.info("Documents table partitioned by publication year")
         return True
     except Exception as e:
-        logger.error(f"Error initializing database: {str(e)}")
+        logger.error(f"Error partitioning documents: {str(e)}")
         return False
 
-# Add a helper function to standardize document types
-def standardize_document_type(doc_type, title=""):
-    """Standardize document types to ensure consistency"""
-    if not doc_type or doc_type.lower() == "null" or doc_type.lower() == "none" or doc_type.lower() == "unspecified":
-        # Try to infer from title
-        title = title.lower()
-        if "executive order" in title or title.startswith("eo"):
-            return "executive_order"
-        elif "notice" in title:
-            return "notice"
-        elif "proposed rule" in title:
-            return "proposed_rule"
-        elif "rule" in title:
-            return "rule"
-        elif "presidential" in title:
-            return "presidential_document"
-        else:
-            return "unspecified"
-    
-    # Standardize known variations
-    doc_type = doc_type.lower()
-    if doc_type in ["executive_order", "eo", "executive order", "e.o."]:
-        return "executive_order"
-    elif doc_type in ["notice", "notices"]:
-        return "notice"
-    elif doc_type in ["proposed_rule", "proposed rule", "proposed rules"]:
-        return "proposed_rule"
-    elif doc_type in ["rule", "rules", "final rule"]:
-        return "rule"
-    elif doc_type in ["presidential_document", "presidential document", "presidential documents"]:
-        return "presidential_document"
-    else:
-        return doc_type
-
-async def insert_documents(documents: List[Dict[str, Any]]) -> Dict[str, int]:
-    """Insert documents into the database with conflict handling"""
-    pool = await get_pool()
+async def ensure_documents_partitions(cur) -> None:
+    """Split yearly partitions off pmax up to PARTITION_YEARS_AHEAD years from now"""
+    await cur.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'documents' AND PARTITION_NAME <> 'pmax'"
+    )
+    years = [int(row["PARTITION_NAME"][1:]) for row in await cur.fetchall()]
+    last_year = max(years) if years else datetime.now().year - 1
+    target_year = datetime.now().year + PARTITION_YEARS_AHEAD
+    if last_year >= target_year:
+        return
+    
+    # Only pmax is rewritten, and it holds no rows until dates run past the last year
+    logger.info(f"Adding documents partitions through {target_year}")
+    await cur.execute(
+        "ALTER TABLE documents REORGANIZE PARTITION pmax INTO ("
+        + ", ".join([_year_partition(year) for year in range(last_year + 1, target_year + 1)]
+                    + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+        + ")"
+    )
+
+async def archive_documents_partition(year: int) -> int:
+    """Move a year of documents out of the live table into documents_archive_<year>
+    
+    The partition is swapped with an empty table by EXCHANGE PARTITION, a
+    metadata-only operation, so archiving costs the same for any number of
+    rows. The year's chunk embeddings are deleted and its document ids are
+    logged in document_deletions. Returns the number of documents archived.
+    """
+    year = int(year)
+    archive_table = f"documents_archive_{year}"
+    try:
+        async with acquire() as conn:
+            async with conn.cursor() as cur:
+                if not await _documents_partitioned(cur):
+                    raise ValueError("documents is not partitioned; run partition_documents() first")
+                
+                await cur.execute(f"SELECT COUNT(*) AS count FROM documents PARTITION (p{year})")
+                archived = (await cur.fetchone())["count"]
+                
+                await cur.execute(f"CREATE TABLE IF NOT EXISTS {archive_table} LIKE documents")
+                await cur.execute(
+                    "SELECT COUNT(*) AS count FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+                    (archive_table,)
+                )
+                if (await cur.fetchone())["count"]:
+                    await cur.execute(f"ALTER TABLE {archive_table} REMOVE PARTITIONING")
+                await cur.execute(f"SELECT EXISTS(SELECT 1 FROM {archive_table}) AS has_rows")
+                if (await cur.fetchone())["has_rows"]:
+                    raise ValueError(f"{archive_table} already holds archived documents")
+                
+                await cur.execute(
+                    f"DELETE FROM vector_embeddings WHERE document_id IN (SELECT id FROM documents PARTITION (p{year}))"
+                )
+                await cur.execute(
+                    f"INSERT INTO document_deletions (document_id) SELECT id FROM documents PARTITION (p{year})"
+                )
+                await cur.execute(f"ALTER TABLE documents EXCHANGE PARTITION p{year} WITH TABLE {archive_table}")
+        
+        query_cache.invalidate()
+        await rebuild_stats()
+        logger.info(f"Archived {archived} documents from {year} to {archive_table}")
+        return archived
+    except Exception as e:
+        logger.error(f"Error archiving documents partition: {str(e)}")
+        return 0
+
+UPSERT_DOCUMENTS_SQL = f"""
+INSERT INTO documents
+({", ".join(UPSERT_COLUMNS)})
+VALUES ({", ".join(["%s"] * len(UPSERT_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+{", ".join(f"{column} = VALUES({column})" for column in UPSERT_COLUMNS[1:])}
+"""
+
+UPSERT_STATS_SQL = """
+INSERT INTO document_stats
+(document_type, document_count, min_publication_date, max_publication_date)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+document_count = document_count + VALUES(document_count),
+min_publication_date = LEAST(COALESCE(min_publication_date, VALUES(min_publication_date)),
+                             COALESCE(VALUES(min_publication_date), min_publication_date)),
+max_publication_date = GREATEST(COALESCE(max_publication_date, VALUES(max_publication_date)),
+                                COALESCE(VALUES(max_publication_date), max_publication_date))
+"""
+
+async def insert_documents(documents: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Insert documents into the database with conflict handling
+    
+    Documents are upserted in chunks of `batch_size` with one multi-row
+    INSERT ... ON DUPLICATE KEY UPDATE on the document_number unique key.
+    Rows whose stored content_hash matches are left out of the upsert
+    entirely, so unchanged documents cost no writes or index maintenance.
+    Counts come from MySQL's affected-row semantics (1 per inserted row,
+    2 per updated row), so "updated" only counts documents that changed.
+    The document_stats rollup is updated in the same transaction.
+    """
+    batch_size = batch_size or DB_BATCH_SIZE
     added = 0
     updated = 0
+    unchanged = 0
+    stats_deltas: Dict[str, Dict[str, Any]] = {}
+    
+    # Later duplicates of a document number win, as with row-by-row upserts
+    unique_documents: Dict[str, Dict[str, Any]] = {}
+    for doc in documents:
+        if doc.get("document_number"):
+            unique_documents[doc["document_number"]] = doc
+    documents = list(unique_documents.values())
     
     try:
-        async with pool.acquire() as conn:
+        async with acquire() as conn:
+            await conn.begin()
             async with conn.cursor() as cur:
-                for doc in documents:
-                    # Standardize document type
-                    doc["document_type"] = standardize_document_type(
-                        doc.get("document_type"), 
-                        doc.get("title", "")
-                    )
+                partitioned = await _documents_partitioned(cur)
+                for chunk in _chunks(documents, batch_size):
+                    for doc in chunk:
+                        if not doc.get("content_hash"):
+                            doc["content_hash"] = compute_content_hash(doc)
+                        doc["document_type"] = canonical_document_type(doc)
                     
-                    # Check if document already exists
+                    # Stored hashes decide which documents are new, changed or unchanged
+                    placeholders = ", ".join(["%s"] * len(chunk))
                     await cur.execute(
-                        "SELECT id FROM documents WHERE document_number = %s", 
-                        (doc.get("document_number"),)
+                        f"SELECT document_number, document_type, content_hash, publication_date FROM documents "
+                        f"WHERE document_number IN ({placeholders})",
+                        [doc["document_number"] for doc in chunk]
                     )
-                    existing = await cur.fetchone()
+                    stored = {row["document_number"]: row for row in await cur.fetchall()}
+                    stored_hashes = {number: row["content_hash"] for number, row in stored.items()}
                     
-                    if existing:
-                        # Update existing document
-                        await cur.execute("""
-                        UPDATE documents 
-                        SET title = %s, publication_date = %s, document_type = %s, 
-                            abstract = %s, html_url = %s, pdf_url = %s, type = %s, subtype = %s
-                        WHERE document_number = %s
-                        """, (
-                            doc.get("title"),
-                            doc.get("publication_date"),
-                            doc.get("document_type"),
-                            doc.get("abstract"),
-                            doc.get("html_url"),
-                            doc.get("pdf_url"),
-                            doc.get("type"),
-                            doc.get("subtype"),
-                            doc.get("document_number")
-                        ))
-                        updated += 1
-                    else:
-                        # Insert new document
-                        await cur.execute("""
-                        INSERT INTO documents 
-                        (document_number, title, publication_date, document_type, abstract, html_url, pdf_url, type, subtype)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            doc.get("document_number"),
-                            doc.get("title"),
-                            doc.get("publication_date"),
-                            doc.get("document_type"),
-                            doc.get("abstract"),
-                            doc.get("html_url"),
-                            doc.get("pdf_url"),
-                            doc.get("type"),
-                            doc.get("subtype")
-                        ))
-                        added += 1
+                    changed = [doc for doc in chunk if stored_hashes.get(doc["document_number"], "") != doc["content_hash"]]
+                    unchanged += len(chunk) - len(changed)
+                    if not changed:
+                        continue
+                    
+                    for doc in changed:
+                        previous = stored.get(doc["document_number"])
+                        if previous is None:
+                            _add_stats_delta(stats_deltas, doc["document_type"], 1, doc.get("publication_date"))
+                        else:
+                            if previous["document_type"] != doc["document_type"]:
+                                _add_stats_delta(stats_deltas, previous["document_type"] or "unspecified", -1)
+                                _add_stats_delta(stats_deltas, doc["document_type"], 1)
+                            _add_stats_delta(stats_deltas, doc["document_type"], 0, doc.get("publication_date"))
+                    
+                    await cur.executemany(
+                        UPSERT_DOCUMENTS_SQL,
+                        [tuple(doc.get(column) for column in UPSERT_COLUMNS) for doc in changed]
+                    )
+                    upserted_rows = cur.rowcount
+                    chunk_added = sum(1 for doc in changed if doc["document_number"] not in stored_hashes)
+                    
+                    # On a partitioned table the upsert key includes publication_date, so a
+                    # re-dated document was inserted as a new row; remove its old row
+                    moved = [
+                        (doc["document_number"], doc.get("publication_date"))
+                        for doc in changed
+                        if partitioned and doc["document_number"] in stored
+                        and str(stored[doc["document_number"]]["publication_date"]) != str(doc.get("publication_date"))
+                    ]
+                    if moved:
+                        await cur.executemany(
+                            "DELETE FROM vector_embeddings WHERE document_id IN "
+                            "(SELECT id FROM documents WHERE document_number = %s AND publication_date <> %s)",
+                            moved
+                        )
+                        await cur.executemany(
+                            "INSERT INTO document_deletions (document_id) "
+                            "SELECT id FROM documents WHERE document_number = %s AND publication_date <> %s",
+                            moved
+                        )
+                        await cur.executemany(
+                            "DELETE FROM documents WHERE document_number = %s AND publication_date <> %s",
+                            moved
+                        )
+                    
+                    added += chunk_added
+                    updated += max(0, upserted_rows - chunk_added - len(moved)) // 2 + len(moved)
                 
                 # Record pipeline run
                 if added > 0 or updated > 0:
@@ -165,91 +760,282 @@ async def insert_documents(documents: List[Dict[str, Any]]) -> Dict[str, int]:
                         VALUES (%s, %s, %s, %s)
                         """, (start_date, end_date, added, updated))
                 
+                if stats_deltas:
+                    await cur.executemany(
+                        UPSERT_STATS_SQL,
+                        [(doc_type, delta["count"], delta["min"], delta["max"])
+                         for doc_type, delta in sorted(stats_deltas.items())]
+                    )
+                
                 await conn.commit()
         
-        logger.info(f"Added {added} new documents, updated {updated} documents")
-        return {"added": added, "updated": updated}
+        if added or updated:
+            query_cache.invalidate()
+        logger.info(f"Added {added} new documents, updated {updated} documents, {unchanged} unchanged")
+        return {"added": added, "updated": updated, "unchanged": unchanged}
     
     except Exception as e:
         logger.error(f"Error inserting documents: {str(e)}")
         return {"added": 0, "updated": 0, "error": str(e)}
-    
-    finally:
-        pool.close()
-        await pool.wait_closed()
 
-async def query_documents(
+def _serialize_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert datetime objects to strings for JSON serialization"""
+    if doc.get("publication_date"):
+        doc["publication_date"] = doc["publication_date"].isoformat()
+    if doc.get("created_at"):
+        doc["created_at"] = doc["created_at"].isoformat()
+    if doc.get("updated_at"):
+        doc["updated_at"] = doc["updated_at"].isoformat()
+    return doc
+
+async def iter_documents(
     keywords: Optional[str] = None,
     document_type: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: int = 10
-) -> List[Dict[str, Any]]:
-    """Query documents from the database based on criteria"""
-    pool = await get_pool()
-    result = []
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    fetch_size: int = 100
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream documents matching the criteria, newest first
+    
+    Rows are ordered by (publication_date, id) descending and read through a
+    server-side cursor `fetch_size` rows at a time, so memory stays flat
+    however many rows match. `after` is a cursor from encode_cursor: the scan
+    resumes just past that row with an index range condition rather than an
+    OFFSET, so a deep page costs the same as the first one.
+    
+    The generator holds a pooled connection until it is exhausted; wrap it in
+    contextlib.aclosing() when stopping early.
+    
+    A partitioned table has no FULLTEXT index, so keyword filters raise
+    ValueError there rather than scanning every row; search.hybrid serves
+    them from the in-process keyword index instead.
+    """
+    query = "SELECT * FROM documents WHERE 1=1"
+    params: List[Any] = []
+    
+    if keywords and await documents_partitioned():
+        raise ValueError("Keyword filters on the partitioned documents table go through the keyword index")
+    elif keywords:
+        # Use MySQL fulltext search
+        query += " AND MATCH(title, abstract) AGAINST(%s IN NATURAL LANGUAGE MODE)"
+        params.append(keywords)
+    
+    if document_type:
+        # Stored types are canonical, so only the filter needs standardizing
+        query += " AND document_type = %s"
+        params.append(standardize_document_type(document_type))
+    
+    if start_date:
+        query += " AND publication_date >= %s"
+        params.append(start_date)
+    
+    if end_date:
+        query += " AND publication_date <= %s"
+        params.append(end_date)
+    
+    if after:
+        after_date, after_id = decode_cursor(after)
+        query += " AND (publication_date < %s OR (publication_date = %s AND id < %s))"
+        params.extend([after_date, after_date, after_id])
+    
+    query += " ORDER BY publication_date DESC, id DESC"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    
+    async with acquire() as conn:
+        async with conn.cursor(TimedSSDictCursor) as cur:
+            await cur.execute(query, params)
+            while True:
+                rows = await cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for doc in rows:
+                    yield _serialize_document(doc)
+
+async def get_documents_by_ids(ids: List[int]) -> List[Dict[str, Any]]:
+    """Fetch documents by primary key, in the order of `ids`"""
+    if not ids:
+        return []
     
     try:
-        async with pool.acquire() as conn:
+        async with acquire() as conn:
             async with conn.cursor() as cur:
-                # Standardize document type if provided
-                if document_type:
-                    document_type = standardize_document_type(document_type)
-                
-                # Build query dynamically
-                query = "SELECT * FROM documents WHERE 1=1"
-                params = []
-                
-                if keywords:
-                    # Use MySQL fulltext search
-                    query += " AND MATCH(title, abstract) AGAINST(%s IN NATURAL LANGUAGE MODE)"
-                    params.append(keywords)
-                
-                if document_type:
-                    query += " AND document_type = %s"
-                    params.append(document_type)
-                
-                if start_date:
-                    query += " AND publication_date >= %s"
-                    params.append(start_date)
-                
-                if end_date:
-                    query += " AND publication_date <= %s"
-                    params.append(end_date)
-                
-                query += " ORDER BY publication_date DESC LIMIT %s"
-                params.append(limit)
-                
-                await cur.execute(query, params)
-                result = await cur.fetchall()
-                
-                # Convert datetime objects to strings for JSON serialization and handle nulls
-                for doc in result:
-                    if "publication_date" in doc and doc["publication_date"]:
-                        doc["publication_date"] = doc["publication_date"].isoformat()
-                    if "created_at" in doc and doc["created_at"]:
-                        doc["created_at"] = doc["created_at"].isoformat()
-                    
-                    # Handle null document_type and standardize
-                    if "document_type" in doc:
-                        doc["document_type"] = standardize_document_type(
-                            doc.get("document_type"), 
-                            doc.get("title", "")
-                        )
-        
-        return result
+                placeholders = ", ".join(["%s"] * len(ids))
+                await cur.execute(f"SELECT * FROM documents WHERE id IN ({placeholders})", list(ids))
+                documents = {doc["id"]: _serialize_document(doc) for doc in await cur.fetchall()}
+        return [documents[doc_id] for doc_id in ids if doc_id in documents]
     
     except Exception as e:
-        logger.error(f"Error querying documents: {str(e)}")
+        logger.error(f"Error fetching documents: {str(e)}")
         return []
+
+async def get_embedding_candidates(
+    document_numbers: Optional[List[str]] = None,
+    after_id: int = 0,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Documents whose chunk embeddings are missing or were made from older content
     
-    finally:
-        pool.close()
-        await pool.wait_closed()
+    Restricted to `document_numbers` when given; otherwise scans the whole
+    table in id order from `after_id`, `limit` documents at a time.
+    """
+    query = """
+    SELECT d.id, d.document_number, d.title, d.abstract, d.content_hash
+    FROM documents d
+    WHERE NOT EXISTS (
+        SELECT 1 FROM vector_embeddings v
+        WHERE v.document_id = d.id AND v.source_hash <=> d.content_hash
+    )
+    """
+    params: List[Any] = []
+    if document_numbers is not None:
+        if not document_numbers:
+            return []
+        query += f" AND d.document_number IN ({', '.join(['%s'] * len(document_numbers))})"
+        params.extend(document_numbers)
+    if after_id:
+        query += " AND d.id > %s"
+        params.append(after_id)
+    query += " ORDER BY d.id"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params)
+            return list(await cur.fetchall())
+
+async def replace_embeddings(document_ids: List[int], rows: List[Tuple[int, int, str, bytes, str]]) -> int:
+    """Replace the chunk embeddings of `document_ids` in one transaction
+    
+    `rows` are (document_id, chunk_index, chunk_text, packed embedding,
+    source content_hash), inserted DB_BATCH_SIZE rows per statement.
+    """
+    if not document_ids:
+        return 0
+    
+    async with acquire() as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cur:
+                for chunk in _chunks(document_ids, DB_BATCH_SIZE):
+                    await cur.execute(
+                        f"DELETE FROM vector_embeddings WHERE document_id IN ({', '.join(['%s'] * len(chunk))})",
+                        chunk
+                    )
+                for chunk in _chunks(rows, DB_BATCH_SIZE):
+                    await cur.executemany(
+                        "INSERT INTO vector_embeddings (document_id, chunk_index, chunk_text, embedding, source_hash) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        chunk
+                    )
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+    return len(rows)
+
+async def iter_documents_for_index(since=None, fetch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """Stream the searchable fields of documents changed at or after `since` (all when None)"""
+    query = "SELECT id, title, abstract, document_type, publication_date, updated_at FROM documents"
+    params: List[Any] = []
+    if since is not None:
+        query += " WHERE updated_at >= %s"
+        params.append(since)
+    
+    async with acquire() as conn:
+        async with conn.cursor(TimedSSDictCursor) as cur:
+            await cur.execute(query, params)
+            while True:
+                rows = await cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+async def iter_document_deletions(since=None, fetch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """Stream (document_id, deleted_at) of documents removed at or after `since` (all when None)"""
+    query = "SELECT document_id, deleted_at FROM document_deletions"
+    params: List[Any] = []
+    if since is not None:
+        query += " WHERE deleted_at >= %s"
+        params.append(since)
+    
+    async with acquire() as conn:
+        async with conn.cursor(TimedSSDictCursor) as cur:
+            await cur.execute(query, params)
+            while True:
+                rows = await cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+async def iter_embeddings(fetch_size: int = 1000) -> AsyncIterator[Tuple[int, bytes]]:
+    """Stream (document_id, packed float32 vector) for every stored chunk embedding"""
+    async with acquire() as conn:
+        async with conn.cursor(TimedSSDictCursor) as cur:
+            await cur.execute("SELECT document_id, embedding FROM vector_embeddings WHERE embedding IS NOT NULL ORDER BY id")
+            while True:
+                rows = await cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row["document_id"], row["embedding"]
+
+async def _rebuild_stats(cur) -> int:
+    await cur.execute("""
+    SELECT document_type, COUNT(*) AS count,
+           MIN(publication_date) AS min_date, MAX(publication_date) AS max_date
+    FROM documents
+    GROUP BY document_type
+    """)
+    
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for row in await cur.fetchall():
+        doc_type = row["document_type"] or "unspecified"
+        _add_stats_delta(deltas, doc_type, row["count"], row["min_date"])
+        _add_stats_delta(deltas, doc_type, 0, row["max_date"])
+    
+    await cur.execute("DELETE FROM document_stats")
+    if deltas:
+        await cur.executemany(
+            UPSERT_STATS_SQL,
+            [(doc_type, delta["count"], delta["min"], delta["max"])
+             for doc_type, delta in sorted(deltas.items())]
+        )
+    return len(deltas)
+
+async def rebuild_stats() -> bool:
+    """Recompute the document_stats rollup from the documents table
+    
+    The rollup is maintained incrementally by insert_documents; this is the
+    full scan used to seed it for an existing database or repair drift.
+    """
+    try:
+        async with acquire() as conn:
+            await conn.begin()
+            async with conn.cursor() as cur:
+                types = await _rebuild_stats(cur)
+                await conn.commit()
+        
+        logger.info(f"Rebuilt document statistics for {types} document types")
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error rebuilding document stats: {str(e)}")
+        return False
 
 async def get_database_stats() -> Dict[str, Any]:
-    """Get database statistics for UI"""
-    pool = await get_pool()
+    """Get database statistics for UI
+    
+    Reads the document_stats rollup (one row per document type) and the
+    latest pipeline run, so the cost does not grow with the documents table.
+    """
     stats = {
         "total_documents": 0,
         "document_types": {},
@@ -258,58 +1044,41 @@ async def get_database_stats() -> Dict[str, Any]:
     }
     
     try:
-        async with pool.acquire() as conn:
+        async with acquire() as conn:
             async with conn.cursor() as cur:
-                # Get document count
-                await cur.execute("SELECT COUNT(*) as count FROM documents")
-                result = await cur.fetchone()
-                stats["total_documents"] = result["count"] if result else 0
-                
-                # First, get a list of all documents with document types
-                # This avoids the GROUP BY issue while still allowing us to process titles
-                await cur.execute("SELECT id, document_type, title FROM documents")
-                documents = await cur.fetchall()
-                
-                # Process document types through standardization
-                doc_type_counts = {}
-                for doc in documents:
-                    doc_type = standardize_document_type(
-                        doc.get("document_type", "unspecified"), 
-                        doc.get("title", "")
-                    )
-                    doc_type_counts[doc_type] = doc_type_counts.get(doc_type, 0) + 1
+                await cur.execute(
+                    "SELECT document_type, document_count, min_publication_date, max_publication_date "
+                    "FROM document_stats WHERE document_count > 0"
+                )
+                min_dates = []
+                max_dates = []
+                for row in await cur.fetchall():
+                    stats["document_types"][row["document_type"]] = row["document_count"]
+                    stats["total_documents"] += row["document_count"]
+                    if row["min_publication_date"]:
+                        min_dates.append(row["min_publication_date"])
+                    if row["max_publication_date"]:
+                        max_dates.append(row["max_publication_date"])
                 
-                # Add the document type counts to the stats
-                stats["document_types"] = doc_type_counts
-                
-                # Get date range
-                await cur.execute("SELECT MIN(publication_date) as min_date, MAX(publication_date) as max_date FROM documents")
-                date_result = await cur.fetchone()
-                if date_result:
-                    stats["date_range"]["min"] = date_result["min_date"].isoformat() if date_result["min_date"] else None
-                    stats["date_range"]["max"] = date_result["max_date"].isoformat() if date_result["max_date"] else None
+                stats["date_range"]["min"] = min(min_dates).isoformat() if min_dates else None
+                stats["date_range"]["max"] = max(max_dates).isoformat() if max_dates else None
                 
                 # Get last update time
-                await cur.execute("SELECT MAX(run_date) as last_update FROM pipeline_runs")
+                await cur.execute("SELECT run_date FROM pipeline_runs ORDER BY id DESC LIMIT 1")
                 update_result = await cur.fetchone()
-                stats["last_update"] = update_result["last_update"].isoformat() if update_result and update_result["last_update"] else None
+                stats["last_update"] = update_result["run_date"].isoformat() if update_result and update_result["run_date"] else None
         
         return stats
     
     except Exception as e:
         logger.error(f"Error getting database stats: {str(e)}")
         return stats
-    
-    finally:
-        pool.close()
-        await pool.wait_closed()
 
 async def log_chat(session_id: str, query: str, response: str, tools_used: Optional[List[str]] = None) -> bool:
     """Log chat interaction to database (optional)"""
-    pool = await get_pool()
     
     try:
-        async with pool.acquire() as conn:
+        async with acquire() as conn:
             async with conn.cursor() as cur:
                 tools_json = json.dumps(tools_used) if tools_used else None
                 
@@ -325,7 +1094,23 @@ async def log_chat(session_id: str, query: str, response: str, tools_used: Optio
     except Exception as e:
         logger.error(f"Error logging chat: {str(e)}")
         return False
+
+async def log_chats(records: List[Tuple[str, str, str, Optional[str]]]) -> bool:
+    """Insert (session_id, query, response, tools_json) chat records in one multi-row statement"""
+    if not records:
+        return True
     
-    finally:
-        pool.close()
-        await pool.wait_closed() 
\ No newline at end of file
+    try:
+        async with acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany("""
+                INSERT INTO chat_history 
+                (session_id, query, response, tools_used)
+                VALUES (%s, %s, %s, %s)
+                """, records)
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error logging chats: {str(e)}")
+        return False
+
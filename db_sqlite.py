@@ -0,0 +1,625 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+
+from db_common import (
+    DB_BATCH_SIZE, UPSERT_COLUMNS,
+    canonical_document_type, compute_content_hash, standardize_document_type,
+    decode_cursor, query_cache, _add_stats_delta, _chunks
+)
+from query_stats import query_stats
+
+logger = logging.getLogger("db_sqlite")
+
+# Database file and the number of threads running SQLite calls
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/federal_register.db")
+SQLITE_THREADS = int(os.getenv("SQLITE_THREADS", 4))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_number TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    publication_date TEXT,
+    document_type TEXT,
+    abstract TEXT,
+    html_url TEXT,
+    pdf_url TEXT,
+    type TEXT,
+    subtype TEXT,
+    content_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_documents_type_date ON documents (document_type, publication_date);
+CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (publication_date);
+CREATE INDEX IF NOT EXISTS idx_documents_updated ON documents (updated_at);
+
+-- Keyword search index kept in sync with documents by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, abstract, content='documents', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, abstract) VALUES ('delete', old.id, old.title, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF title, abstract ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, abstract) VALUES ('delete', old.id, old.title, old.abstract);
+    INSERT INTO documents_fts (rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+END;
+
+-- Removed document ids, read by the in-process keyword index refresh
+CREATE TABLE IF NOT EXISTS document_deletions (
+    document_id INTEGER NOT NULL,
+    deleted_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_document_deletions_deleted ON document_deletions (deleted_at);
+CREATE TRIGGER IF NOT EXISTS documents_deletions_log AFTER DELETE ON documents BEGIN
+    INSERT INTO document_deletions (document_id) VALUES (old.id);
+END;
+
+CREATE TABLE IF NOT EXISTS document_stats (
+    document_type TEXT PRIMARY KEY,
+    document_count INTEGER NOT NULL DEFAULT 0,
+    min_publication_date TEXT,
+    max_publication_date TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS pipeline_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_date TEXT DEFAULT CURRENT_TIMESTAMP,
+    start_date TEXT,
+    end_date TEXT,
+    documents_added INTEGER DEFAULT 0,
+    documents_updated INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS chat_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    tools_used TEXT,
+    query_time TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id);
+
+CREATE TABLE IF NOT EXISTS vector_embeddings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL DEFAULT 0,
+    chunk_text TEXT NOT NULL,
+    embedding BLOB,
+    source_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_vector_embeddings_document ON vector_embeddings (document_id, chunk_index);
+"""
+
+UPSERT_DOCUMENTS_SQL = f"""
+INSERT INTO documents
+({", ".join(UPSERT_COLUMNS)})
+VALUES ({", ".join(["?"] * len(UPSERT_COLUMNS))})
+ON CONFLICT (document_number) DO UPDATE SET
+{", ".join(f"{column} = excluded.{column}" for column in UPSERT_COLUMNS[1:])},
+updated_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_STATS_SQL = """
+INSERT INTO document_stats
+(document_type, document_count, min_publication_date, max_publication_date)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (document_type) DO UPDATE SET
+document_count = document_count + excluded.document_count,
+min_publication_date = MIN(COALESCE(min_publication_date, excluded.min_publication_date),
+                           COALESCE(excluded.min_publication_date, min_publication_date)),
+max_publication_date = MAX(COALESCE(max_publication_date, excluded.max_publication_date),
+                           COALESCE(excluded.max_publication_date, max_publication_date)),
+updated_at = CURRENT_TIMESTAMP
+"""
+
+_FTS_TOKEN_RE = re.compile(r"\w+")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_local = threading.local()
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_stats = {"calls": 0, "in_use": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+class _TimedConnection(sqlite3.Connection):
+    """Connection that records every execute() in query_stats, as db_connector's cursors do"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        fingerprint = query_stats.record(sql, (time.perf_counter() - started) * 1000)
+        if fingerprint:
+            try:
+                plan = super().execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+                query_stats.set_plan(fingerprint, plan)
+            except Exception as e:
+                logger.error(f"Error explaining slow query: {str(e)}")
+        return cursor
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        cursor = super().executemany(sql, parameters)
+        query_stats.record(sql, (time.perf_counter() - started) * 1000)
+        return cursor
+
+def _dict_factory(cursor, row):
+    return {column[0]: row[index] for index, column in enumerate(cursor.description)}
+
+def _open_connection() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(SQLITE_PATH) or ".", exist_ok=True)
+    # Autocommit mode; writes open explicit transactions
+    conn = sqlite3.connect(
+        SQLITE_PATH, timeout=30, isolation_level=None, check_same_thread=False, factory=_TimedConnection
+    )
+    conn.row_factory = _dict_factory
+    # WAL lets readers run alongside the single writer
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def _connection() -> sqlite3.Connection:
+    """Connection owned by the current worker thread"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _open_connection()
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+async def _run(function, *args):
+    """Run `function(conn, *args)` on the SQLite thread pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=SQLITE_THREADS, thread_name_prefix="sqlite")
+    submitted = time.perf_counter()
+
+    def call():
+        waited = time.perf_counter() - submitted
+        _stats["calls"] += 1
+        _stats["wait_total"] += waited
+        _stats["wait_max"] = max(_stats["wait_max"], waited)
+        _stats["in_use"] += 1
+        try:
+            return function(_connection(), *args)
+        finally:
+            _stats["in_use"] -= 1
+
+    return await asyncio.get_running_loop().run_in_executor(_executor, call)
+
+async def init_pool():
+    """Start the SQLite thread pool"""
+    await _run(lambda conn: None)
+
+async def close_pool() -> None:
+    """Stop the thread pool and close its connections"""
+    global _executor
+    if _executor is None:
+        return
+    executor, _executor = _executor, None
+    await asyncio.get_running_loop().run_in_executor(None, partial(executor.shutdown, wait=True))
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+    logger.info("Closed SQLite connections")
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Thread pool usage for monitoring"""
+    calls = _stats["calls"]
+    return {
+        "backend": "sqlite",
+        "path": SQLITE_PATH,
+        "initialized": _executor is not None,
+        "size": len(_connections),
+        "maxsize": SQLITE_THREADS,
+        "in_use": _stats["in_use"],
+        "acquires": calls,
+        "acquire_wait_avg_ms": round(_stats["wait_total"] / calls * 1000, 3) if calls else 0.0,
+        "acquire_wait_max_ms": round(_stats["wait_max"] * 1000, 3)
+    }
+
+# Recorded in PRAGMA user_version; bump when SCHEMA changes and migrate in init_db
+SCHEMA_VERSION = 2
+
+def _migrate(conn: sqlite3.Connection) -> int:
+    version = conn.execute("PRAGMA user_version").fetchone()["user_version"]
+    if version >= SCHEMA_VERSION:
+        return 0
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return SCHEMA_VERSION - version
+
+async def init_db():
+    """Create the SQLite schema unless user_version says it is current"""
+    try:
+        applied = await _run(_migrate)
+        logger.info(f"SQLite database initialized at {SQLITE_PATH} ({applied} migrations applied)")
+        return True
+    except Exception as e:
+        logger.error(f"Error initializing database: {str(e)}")
+        return False
+
+async def analyze_tables() -> bool:
+    """Refresh query planner statistics"""
+    try:
+        await _run(lambda conn: conn.execute("ANALYZE"))
+        return True
+    except Exception as e:
+        logger.error(f"Error analyzing tables: {str(e)}")
+        return False
+
+async def partition_documents() -> bool:
+    """Partitioning is a MySQL feature; SQLite date filters use idx_documents_date"""
+    logger.error("Error partitioning documents: not supported by the SQLite backend")
+    return False
+
+async def archive_documents_partition(year: int) -> int:
+    logger.error("Error archiving documents partition: not supported by the SQLite backend")
+    return 0
+
+def _insert_documents(conn: sqlite3.Connection, documents: List[Dict[str, Any]], batch_size: int) -> Dict[str, int]:
+    added = 0
+    updated = 0
+    unchanged = 0
+    stats_deltas: Dict[str, Dict[str, Any]] = {}
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for chunk in _chunks(documents, batch_size):
+            for doc in chunk:
+                if not doc.get("content_hash"):
+                    doc["content_hash"] = compute_content_hash(doc)
+                doc["document_type"] = canonical_document_type(doc)
+
+            # Stored hashes decide which documents are new, changed or unchanged
+            placeholders = ", ".join(["?"] * len(chunk))
+            stored = {
+                row["document_number"]: row for row in conn.execute(
+                    f"SELECT document_number, document_type, content_hash FROM documents "
+                    f"WHERE document_number IN ({placeholders})",
+                    [doc["document_number"] for doc in chunk]
+                )
+            }
+
+            changed = [
+                doc for doc in chunk
+                if (stored.get(doc["document_number"]) or {}).get("content_hash", "") != doc["content_hash"]
+            ]
+            unchanged += len(chunk) - len(changed)
+            if not changed:
+                continue
+
+            for doc in changed:
+                previous = stored.get(doc["document_number"])
+                if previous is None:
+                    added += 1
+                    _add_stats_delta(stats_deltas, doc["document_type"], 1, doc.get("publication_date"))
+                else:
+                    updated += 1
+                    if previous["document_type"] != doc["document_type"]:
+                        _add_stats_delta(stats_deltas, previous["document_type"] or "unspecified", -1)
+                        _add_stats_delta(stats_deltas, doc["document_type"], 1)
+                    _add_stats_delta(stats_deltas, doc["document_type"], 0, doc.get("publication_date"))
+
+            conn.executemany(
+                UPSERT_DOCUMENTS_SQL,
+                [tuple(doc.get(column) for column in UPSERT_COLUMNS) for doc in changed]
+            )
+
+        # Record pipeline run
+        if added > 0 or updated > 0:
+            dates = [doc.get("publication_date") for doc in documents if doc.get("publication_date")]
+            if dates:
+                conn.execute(
+                    "INSERT INTO pipeline_runs (start_date, end_date, documents_added, documents_updated) "
+                    "VALUES (?, ?, ?, ?)",
+                    (min(dates), max(dates), added, updated)
+                )
+
+        if stats_deltas:
+            conn.executemany(
+                UPSERT_STATS_SQL,
+                [(doc_type, delta["count"], delta["min"], delta["max"])
+                 for doc_type, delta in sorted(stats_deltas.items())]
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return {"added": added, "updated": updated, "unchanged": unchanged}
+
+async def insert_documents(documents: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Upsert documents in one transaction, skipping rows whose content_hash is unchanged"""
+    # Later duplicates of a document number win, as with row-by-row upserts
+    unique_documents: Dict[str, Dict[str, Any]] = {}
+    for doc in documents:
+        if doc.get("document_number"):
+            unique_documents[doc["document_number"]] = doc
+
+    try:
+        result = await _run(_insert_documents, list(unique_documents.values()), batch_size or DB_BATCH_SIZE)
+    except Exception as e:
+        logger.error(f"Error inserting documents: {str(e)}")
+        return {"added": 0, "updated": 0, "error": str(e)}
+
+    if result["added"] or result["updated"]:
+        query_cache.invalidate()
+    logger.info(f"Added {result['added']} new documents, updated {result['updated']} documents, {result['unchanged']} unchanged")
+    return result
+
+async def supports_keyword_filter() -> bool:
+    """Keyword filters always use the FTS5 table"""
+    return True
+
+def _fts_query(keywords: str) -> str:
+    """FTS5 query matching any keyword, like natural-language FULLTEXT search"""
+    return " OR ".join(f'"{token}"' for token in _FTS_TOKEN_RE.findall(keywords))
+
+async def iter_documents(
+    keywords: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    fetch_size: int = 100
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream documents matching the criteria, newest first (see db_connector.iter_documents)"""
+    query = "SELECT * FROM documents WHERE 1=1"
+    params: List[Any] = []
+
+    if keywords:
+        fts_query = _fts_query(keywords)
+        if not fts_query:
+            return
+        query += " AND id IN (SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?)"
+        params.append(fts_query)
+
+    if document_type:
+        query += " AND document_type = ?"
+        params.append(standardize_document_type(document_type))
+
+    if start_date:
+        query += " AND publication_date >= ?"
+        params.append(start_date)
+
+    if end_date:
+        query += " AND publication_date <= ?"
+        params.append(end_date)
+
+    if after:
+        after_date, after_id = decode_cursor(after)
+        query += " AND (publication_date < ? OR (publication_date = ? AND id < ?))"
+        params.extend([after_date, after_date, after_id])
+
+    query += " ORDER BY publication_date DESC, id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    async for row in _stream(query, params, fetch_size):
+        yield row
+
+async def _stream(query: str, params: List[Any], fetch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    """Read a query's rows in batches on a connection private to this stream"""
+    loop = asyncio.get_running_loop()
+    conn = await loop.run_in_executor(None, _open_connection)
+    try:
+        cursor = await loop.run_in_executor(None, conn.execute, query, params)
+        while True:
+            rows = await loop.run_in_executor(None, cursor.fetchmany, fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        conn.close()
+
+async def get_documents_by_ids(ids: List[int]) -> List[Dict[str, Any]]:
+    """Fetch documents by primary key, in the order of `ids`"""
+    if not ids:
+        return []
+
+    def fetch(conn):
+        placeholders = ", ".join(["?"] * len(ids))
+        return {row["id"]: row for row in conn.execute(f"SELECT * FROM documents WHERE id IN ({placeholders})", list(ids))}
+
+    try:
+        documents = await _run(fetch)
+        return [documents[doc_id] for doc_id in ids if doc_id in documents]
+    except Exception as e:
+        logger.error(f"Error fetching documents: {str(e)}")
+        return []
+
+async def get_database_stats() -> Dict[str, Any]:
+    """Get database statistics for UI from the document_stats rollup"""
+    stats = {
+        "total_documents": 0,
+        "document_types": {},
+        "date_range": {"min": None, "max": None},
+        "last_update": None
+    }
+
+    def fetch(conn):
+        rows = conn.execute(
+            "SELECT document_type, document_count, min_publication_date, max_publication_date "
+            "FROM document_stats WHERE document_count > 0"
+        ).fetchall()
+        last_run = conn.execute("SELECT run_date FROM pipeline_runs ORDER BY id DESC LIMIT 1").fetchone()
+        return rows, last_run
+
+    try:
+        rows, last_run = await _run(fetch)
+        for row in rows:
+            stats["document_types"][row["document_type"]] = row["document_count"]
+            stats["total_documents"] += row["document_count"]
+        min_dates = [row["min_publication_date"] for row in rows if row["min_publication_date"]]
+        max_dates = [row["max_publication_date"] for row in rows if row["max_publication_date"]]
+        stats["date_range"]["min"] = min(min_dates) if min_dates else None
+        stats["date_range"]["max"] = max(max_dates) if max_dates else None
+        stats["last_update"] = last_run["run_date"] if last_run else None
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error getting database stats: {str(e)}")
+        return stats
+
+async def rebuild_stats() -> bool:
+    """Recompute the document_stats rollup from the documents table"""
+    def rebuild(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM document_stats")
+            conn.execute("""
+            INSERT INTO document_stats (document_type, document_count, min_publication_date, max_publication_date)
+            SELECT COALESCE(document_type, 'unspecified'), COUNT(*), MIN(publication_date), MAX(publication_date)
+            FROM documents GROUP BY COALESCE(document_type, 'unspecified')
+            """)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    try:
+        await _run(rebuild)
+        logger.info("Rebuilt document statistics")
+        return True
+    except Exception as e:
+        logger.error(f"Error rebuilding document stats: {str(e)}")
+        return False
+
+async def log_chat(session_id: str, query: str, response: str, tools_used: Optional[List[str]] = None) -> bool:
+    """Log chat interaction to database (optional)"""
+    try:
+        await _run(
+            lambda conn: conn.execute(
+                "INSERT INTO chat_history (session_id, query, response, tools_used) VALUES (?, ?, ?, ?)",
+                (session_id, query, response, json.dumps(tools_used) if tools_used else None)
+            )
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error logging chat: {str(e)}")
+        return False
+
+async def log_chats(records: List[Tuple[str, str, str, Optional[str]]]) -> bool:
+    """Insert (session_id, query, response, tools_json) chat records in one transaction"""
+    if not records:
+        return True
+
+    def insert(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO chat_history (session_id, query, response, tools_used) VALUES (?, ?, ?, ?)",
+                records
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    try:
+        await _run(insert)
+        return True
+    except Exception as e:
+        logger.error(f"Error logging chats: {str(e)}")
+        return False
+
+async def iter_documents_for_index(since=None, fetch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """Stream the searchable fields of documents changed at or after `since` (all when None)"""
+    query = "SELECT id, title, abstract, document_type, publication_date, updated_at FROM documents"
+    params: List[Any] = []
+    if since is not None:
+        query += " WHERE updated_at >= ?"
+        params.append(since)
+    async for row in _stream(query, params, fetch_size):
+        yield row
+
+async def iter_document_deletions(since=None, fetch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """Stream (document_id, deleted_at) of documents removed at or after `since` (all when None)"""
+    query = "SELECT document_id, deleted_at FROM document_deletions"
+    params: List[Any] = []
+    if since is not None:
+        query += " WHERE deleted_at >= ?"
+        params.append(since)
+    async for row in _stream(query, params, fetch_size):
+        yield row
+
+async def iter_embeddings(fetch_size: int = 1000) -> AsyncIterator[Tuple[int, bytes]]:
+    """Stream (document_id, packed float32 vector) for every stored chunk embedding"""
+    async for row in _stream(
+        "SELECT document_id, embedding FROM vector_embeddings WHERE embedding IS NOT NULL ORDER BY id", [], fetch_size
+    ):
+        yield row["document_id"], row["embedding"]
+
+async def get_embedding_candidates(
+    document_numbers: Optional[List[str]] = None,
+    after_id: int = 0,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Documents whose chunk embeddings are missing or were made from older content"""
+    query = """
+    SELECT d.id, d.document_number, d.title, d.abstract, d.content_hash
+    FROM documents d
+    WHERE NOT EXISTS (
+        SELECT 1 FROM vector_embeddings v
+        WHERE v.document_id = d.id AND v.source_hash IS d.content_hash
+    )
+    """
+    params: List[Any] = []
+    if document_numbers is not None:
+        if not document_numbers:
+            return []
+        query += f" AND d.document_number IN ({', '.join(['?'] * len(document_numbers))})"
+        params.extend(document_numbers)
+    if after_id:
+        query += " AND d.id > ?"
+        params.append(after_id)
+    query += " ORDER BY d.id"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return await _run(lambda conn: conn.execute(query, params).fetchall())
+
+async def replace_embeddings(document_ids: List[int], rows: List[Tuple[int, int, str, bytes, str]]) -> int:
+    """Replace the chunk embeddings of `document_ids` in one transaction"""
+    if not document_ids:
+        return 0
+
+    def replace(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for chunk in _chunks(document_ids, DB_BATCH_SIZE):
+                conn.execute(f"DELETE FROM vector_embeddings WHERE document_id IN ({', '.join(['?'] * len(chunk))})", chunk)
+            conn.executemany(
+                "INSERT INTO vector_embeddings (document_id, chunk_index, chunk_text, embedding, source_hash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    await _run(replace)
+    return len(rows)
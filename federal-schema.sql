@@ -5,6 +5,9 @@ CREATE DATABASE IF NOT EXISTS federal_register;
 USE federal_register;
 
 -- Federal Register database schema
+-- The current schema, for creating a database by hand. init_db (db_connector)
+-- reaches the same schema by applying its migrations on top of the frozen
+-- version 1 baseline; a schema change adds a migration and updates this file.
 
 -- Create documents table if it doesn't exist
 CREATE TABLE IF NOT EXISTS documents (
@@ -18,10 +21,26 @@ CREATE TABLE IF NOT EXISTS documents (
     pdf_url VARCHAR(255),
     type VARCHAR(100),
     subtype VARCHAR(100),
+    content_hash CHAR(64),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FULLTEXT(title, abstract)
+    -- Changes only when an upsert changes the row; drives incremental search index refresh
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FULLTEXT(title, abstract),
+    -- Filtered "latest X" queries are range scans on these instead of filesorts
+    INDEX idx_documents_type_date (document_type, publication_date),
+    INDEX idx_documents_date (publication_date),
+    INDEX idx_documents_updated (updated_at),
+    -- Covers the change-detection lookup made for every ingested document
+    INDEX idx_documents_number_hash (document_number, content_hash, document_type, publication_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Large corpora can range-partition documents by publication year so that
+-- date-bounded queries prune partitions and old years archive with
+-- EXCHANGE PARTITION. MySQL does not allow FULLTEXT indexes or foreign keys
+-- on partitioned tables, so this is an opt-in migration (db_connector.partition_documents):
+--   python pipeline/main.py --partition-documents
+--   python pipeline/main.py --archive-partition 2015
+
 -- Create pipeline_runs table to track data updates
 CREATE TABLE IF NOT EXISTS pipeline_runs (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -32,6 +51,23 @@ CREATE TABLE IF NOT EXISTS pipeline_runs (
     documents_updated INT DEFAULT 0
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Ids of documents removed from the documents table (archived partitions,
+-- re-dated rows), so the in-process keyword index can drop them
+CREATE TABLE IF NOT EXISTS document_deletions (
+    document_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_document_deletions_deleted (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Create document_stats rollup maintained by ingestion (one row per document type)
+CREATE TABLE IF NOT EXISTS document_stats (
+    document_type VARCHAR(50) PRIMARY KEY,
+    document_count INT NOT NULL DEFAULT 0,
+    min_publication_date DATE,
+    max_publication_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- Create chat_history table to log user interactions
 CREATE TABLE IF NOT EXISTS chat_history (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -49,25 +85,25 @@ CREATE TABLE IF NOT EXISTS vector_embeddings (
     document_id INT NOT NULL,
     chunk_index INT NOT NULL DEFAULT 0,
     chunk_text TEXT NOT NULL,
-    embedding_vector JSON,
+    -- Packed little-endian float32 vector
+    embedding BLOB,
+    -- content_hash of the document the chunk was embedded from
+    source_hash CHAR(64),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE,
     INDEX(document_id, chunk_index)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
--- Create vector_search procedure for similarity search
--- This is a placeholder - in production it would use an approximation algorithm
-DELIMITER //
-CREATE PROCEDURE IF NOT EXISTS vector_search(IN query_vector JSON, IN limit_count INT)
-BEGIN
-    -- In a real implementation, this would use a vector similarity algorithm
-    -- For this schema file, we'll just return the newest documents as a placeholder
-    SELECT d.* FROM documents d
-    ORDER BY d.publication_date DESC
-    LIMIT limit_count;
-END //
-DELIMITER ;
+-- Similarity search runs in-process (search/vector.py); drop the old placeholder procedure
+DROP PROCEDURE IF EXISTS vector_search;
+
+-- Applied schema versions; db_connector.init_db runs the migrations not yet recorded here
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Optimize MySQL for fulltext search
 -- SET GLOBAL innodb_ft_min_token_size = 3;
-ANALYZE TABLE documents; 
\ No newline at end of file
+-- Optimizer statistics are refreshed on demand: python pipeline/main.py --analyze 
\ No newline at end of file
@@ -0,0 +1,94 @@
+import gzip
+import json
+import os
+import zlib
+import logging
+from typing import Any, Dict, Iterable, Iterator
+
+import aiofiles
+
+logger = logging.getLogger("archive")
+
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", 6))
+ARCHIVE_SUFFIX = ".ndjson.gz"
+
+# Compressed bytes are buffered up to this size before hitting the disk
+_FLUSH_BYTES = 64 * 1024
+
+class NDJSONArchiveWriter:
+    """Streaming writer for gzip-compressed NDJSON archives
+
+    Records are encoded one per line and compressed incrementally, so memory
+    stays proportional to one record rather than the whole day. The file is
+    written under a temporary name and renamed on close, so readers never
+    see a partially written archive.
+
+        async with NDJSONArchiveWriter(path) as archive:
+            await archive.write_many(documents)
+    """
+
+    def __init__(self, path: str, compression_level: int = ARCHIVE_COMPRESSION_LEVEL):
+        self.path = path
+        self.records = 0
+        self._tmp_path = f"{path}.tmp"
+        # wbits=31 produces a gzip container readable by gzip.open
+        self._compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+        self._buffer = bytearray()
+        self._file = None
+
+    async def open(self) -> "NDJSONArchiveWriter":
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = await aiofiles.open(self._tmp_path, "wb")
+        return self
+
+    async def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._buffer += self._compressor.compress(line.encode("utf-8"))
+        self.records += 1
+        if len(self._buffer) >= _FLUSH_BYTES:
+            await self._flush()
+
+    async def write_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            await self.write(record)
+
+    async def _flush(self) -> None:
+        if self._buffer:
+            await self._file.write(bytes(self._buffer))
+            self._buffer.clear()
+
+    async def close(self) -> None:
+        if self._file is None:
+            return
+        self._buffer += self._compressor.flush()
+        await self._flush()
+        await self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    async def abort(self) -> None:
+        """Discard a partially written archive"""
+        if self._file is None:
+            return
+        await self._file.close()
+        self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    async def __aenter__(self) -> "NDJSONArchiveWriter":
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
+        return False
+
+def iter_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily iterate the records of a gzip-compressed NDJSON archive"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiofiles
+
+logger = logging.getLogger("checkpoints")
+
+CHECKPOINT_DIR = "data/checkpoints"
+MANIFEST_FILE = f"{CHECKPOINT_DIR}/manifest.jsonl"
+LEGACY_FINGERPRINT_FILE = f"{CHECKPOINT_DIR}/day_fingerprints.json"
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+def document_digest(doc: Dict[str, Any]) -> str:
+    """Stable digest of one raw API document"""
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def combine_digests(digests: Iterable[str]) -> str:
+    """Order-independent fingerprint of a set of document digests
+
+    Pages arrive in completion order, so digests are sorted before hashing.
+    """
+    combined = hashlib.sha256()
+    for digest in sorted(digests):
+        combined.update(digest.encode("ascii"))
+    return combined.hexdigest()
+
+class IngestManifest:
+    """Durable per-day ingest manifest
+
+    Records, for every publication date, the status of its last ingest, the
+    document count, the content fingerprint and HTTP validators of the API
+    response, and how long it took. The manifest is an append-only JSON Lines
+    log (the last line for a date wins), so recording a day is a single
+    append no matter how many days are tracked, and a crash can lose at most
+    the line being written. The log is compacted on load once it has grown
+    well past the number of tracked days.
+    """
+
+    def __init__(self, path: str = MANIFEST_FILE):
+        self.path = path
+        self._lock = asyncio.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        lines = 0
+        torn = False
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn final line from an interrupted write
+                            torn = True
+                            continue
+                        self.entries[entry["date"]] = entry
+                        lines += 1
+            elif os.path.exists(LEGACY_FINGERPRINT_FILE):
+                self._import_fingerprints()
+                lines = 0
+        except Exception as e:
+            logger.error(f"Error loading ingest manifest: {str(e)}")
+
+        # Rewrite the log when it has grown, was imported, or ends in a torn line
+        # (otherwise the next append would be glued onto the torn one)
+        if torn or lines > 2 * len(self.entries) + 100 or (self.entries and lines == 0):
+            self._compact()
+
+    def _import_fingerprints(self) -> None:
+        """Seed the manifest from the day fingerprints written by older versions"""
+        with open(LEGACY_FINGERPRINT_FILE, "r") as f:
+            fingerprints = json.load(f)
+        for date_str, entry in fingerprints.items():
+            self.entries[date_str] = {
+                "date": date_str,
+                "status": STATUS_DONE,
+                "documents": entry.get("documents", 0),
+                "hash": entry.get("hash"),
+                "etag": entry.get("etag"),
+                "last_modified": entry.get("last_modified")
+            }
+        logger.info(f"Imported {len(fingerprints)} day fingerprints into the ingest manifest")
+
+    def _compact(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for date_str in sorted(self.entries):
+                f.write(json.dumps(self.entries[date_str], sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def get(self, date_str: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(date_str)
+
+    def pending_days(self, dates: List[str]) -> List[str]:
+        """Dates that were never ingested or whose last ingest failed"""
+        return [
+            date_str for date_str in dates
+            if (self.entries.get(date_str) or {}).get("status") != STATUS_DONE
+        ]
+
+    def validators(self, date_str: str) -> Dict[str, str]:
+        """Conditional request headers for a previously fetched day"""
+        entry = self.entries.get(date_str) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, date_str: str, fingerprint: Optional[str]) -> bool:
+        entry = self.entries.get(date_str)
+        return bool(
+            fingerprint and entry
+            and entry.get("status") == STATUS_DONE
+            and entry.get("hash") == fingerprint
+        )
+
+    async def record_day(self, day: Dict[str, Any]) -> None:
+        """Append the outcome of one pipeline day
+
+        Unchanged days keep the fingerprint and validators of the ingest they
+        were compared against. A failed day keeps no fingerprint, so it is
+        neither skipped nor short-circuited on the next run.
+        """
+        previous = self.entries.get(day["date"]) or {}
+        failed = "error" in day
+        entry = {
+            "date": day["date"],
+            "status": STATUS_FAILED if failed else STATUS_DONE,
+            "documents": previous.get("documents", 0) if day.get("unchanged") else day.get("documents", 0),
+            "added": day.get("added", 0),
+            "updated": day.get("updated", 0),
+            "duration": day.get("duration"),
+            "recorded_at": datetime.now().isoformat(timespec="seconds")
+        }
+        if failed:
+            entry["error"] = day["error"]
+        elif day.get("unchanged"):
+            entry["hash"] = previous.get("hash")
+            entry["etag"] = previous.get("etag")
+            entry["last_modified"] = previous.get("last_modified")
+        else:
+            validators = day.get("validators") or {}
+            entry["hash"] = day.get("fingerprint")
+            entry["etag"] = validators.get("etag")
+            entry["last_modified"] = validators.get("last_modified")
+
+        async with self._lock:
+            self.entries[day["date"]] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            async with aiofiles.open(self.path, "a") as f:
+                await f.write(json.dumps(entry, sort_keys=True) + "\n")
+                await f.flush()
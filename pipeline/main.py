@@ -1,18 +1,26 @@
 import asyncio
 import aiohttp
-import aiofiles
-import json
 import os
 import sys
+import time
 import logging
+from contextlib import aclosing
 from datetime import datetime, timedelta, date
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from pipeline.processor import process_federal_register_data, enrich_documents
-from db_connector import init_db, insert_documents
+from pipeline.processor import process_federal_register_data, enrich_documents, backfill_embeddings
+from pipeline.archive import NDJSONArchiveWriter, ARCHIVE_SUFFIX
+from pipeline.checkpoints import IngestManifest, document_digest, combine_digests
+from pipeline.rate_limiter import TokenBucket
+from pipeline.stages import Stage, run_stages
+from db_backend import (
+    init_db, insert_documents, close_pool, rebuild_stats, analyze_tables,
+    partition_documents, archive_documents_partition
+)
+from search.semantic import build_vector_index, publish_vector_index
 
 # Configure logging
 logging.basicConfig(
@@ -21,18 +29,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger("pipeline")
 
-# Create a checkpoints directory
+# Create a checkpoints directory (holds the per-day ingest manifest)
 os.makedirs("data/checkpoints", exist_ok=True)
-CHECKPOINT_FILE = "data/checkpoints/last_processed_date.txt"
 
-async def download_federal_register_data(date: datetime) -> Optional[Dict[str, Any]]:
-    """Download data from Federal Register API for specific date"""
-    # Format: YYYY-MM-DD
-    date_str = date.strftime('%Y-%m-%d')
+# API configuration (the base URL can point at a local stub server for testing)
+API_BASE_URL = os.getenv("FEDERAL_REGISTER_API_URL", "https://www.federalregister.gov/api/v1")
+API_RATE_LIMIT = float(os.getenv("FEDERAL_REGISTER_RATE_LIMIT", 1))  # requests per second
+API_RATE_BURST = int(os.getenv("FEDERAL_REGISTER_RATE_BURST", 1))
+API_TIMEOUT = float(os.getenv("FEDERAL_REGISTER_TIMEOUT", 60))
+API_PER_PAGE = int(os.getenv("FEDERAL_REGISTER_PER_PAGE", 100))
+API_RETRIES = int(os.getenv("FEDERAL_REGISTER_RETRIES", 2))
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", 4))
+PIPELINE_OVERLAP_DAYS = int(os.getenv("PIPELINE_OVERLAP_DAYS", 2))  # recent days always re-checked
+PAGE_CONCURRENCY = int(os.getenv("PAGE_CONCURRENCY", 4))
+# Process workers consume page streams, so they also bound the days fetching pages at once
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", 4))
+INSERT_WORKERS = int(os.getenv("INSERT_WORKERS", 2))
+STAGE_QUEUE_SIZE = int(os.getenv("STAGE_QUEUE_SIZE", 8))
+
+# Bulk (range-window) ingestion tuning
+API_MAX_RESULTS = int(os.getenv("FEDERAL_REGISTER_MAX_RESULTS", 10000))  # API cap per query
+BULK_WINDOW_DAYS = int(os.getenv("BULK_WINDOW_DAYS", 31))
+BULK_TARGET_RESULTS = int(os.getenv("BULK_TARGET_RESULTS", 5000))
+BULK_MAX_WINDOW_DAYS = 366
+
+def create_rate_limiter(rate: Optional[float] = None, burst: Optional[int] = None) -> TokenBucket:
+    """Create a token bucket enforcing the Federal Register API request budget"""
+    return TokenBucket(rate or API_RATE_LIMIT, burst or API_RATE_BURST)
+
+def create_session(max_connections: int = PIPELINE_CONCURRENCY * PAGE_CONCURRENCY) -> aiohttp.ClientSession:
+    """Create a pooled keep-alive HTTP session shared by all downloads of a run"""
+    connector = aiohttp.TCPConnector(limit=max(1, max_connections), keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=API_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def build_documents_url(conditions: Dict[str, str], page: int = 1) -> str:
+    """Build a documents.json URL for the given search conditions and page
     
-    # Correct API URL according to documentation
-    url = (
-        f"https://www.federalregister.gov/api/v1/documents.json"
+    Condition keys are the bracketed parameter path, e.g. "[publication_date][is]".
+    """
+    condition_params = "".join(f"&conditions{key}={value}" for key, value in conditions.items())
+    return (
+        f"{API_BASE_URL}/documents.json"
         f"?fields[]=document_number"
         f"&fields[]=title"
         f"&fields[]=publication_date"
@@ -42,118 +80,613 @@ async def download_federal_register_data(date: datetime) -> Optional[Dict[str, A
         f"&fields[]=html_url"
         f"&fields[]=pdf_url"
         f"&fields[]=subtype"
-        f"&conditions[publication_date][is]={date_str}"
-        f"&per_page=100"
+        f"{condition_params}"
+        f"&per_page={API_PER_PAGE}"
+        f"&page={page}"
     )
 
+async def request_documents_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    limiter: Optional[TokenBucket] = None,
+    retries: int = API_RETRIES,
+    headers: Optional[Dict[str, str]] = None
+) -> Tuple[Optional[int], Optional[Dict[str, Any]], Dict[str, str]]:
+    """Fetch one page of documents.json, retrying transient failures
+    
+    Returns (status, data, validators) where validators holds the response's
+    ETag / Last-Modified headers. A 304 answer to conditional `headers`
+    returns status 304 with no data.
+    """
+    status = None
+    for attempt in range(retries + 1):
+        try:
+            # Respect the API request budget shared by all concurrent downloads
+            if limiter:
+                await limiter.acquire()
+            
+            async with session.get(url, headers=headers) as response:
+                status = response.status
+                validators = {}
+                if response.headers.get("ETag"):
+                    validators["etag"] = response.headers["ETag"]
+                if response.headers.get("Last-Modified"):
+                    validators["last_modified"] = response.headers["Last-Modified"]
+                
+                if response.status == 200:
+                    return status, await response.json(), validators
+                if response.status == 304:
+                    return status, None, validators
+                
+                error_text = await response.text()
+                logger.error(f"HTTP {response.status} fetching {url} - {error_text[:200]}")
+                # Client errors other than throttling will not succeed on retry
+                if response.status < 500 and response.status != 429:
+                    return status, None, {}
+        except Exception as e:
+            logger.error(f"Exception fetching {url}: {str(e)}")
+        
+        if attempt < retries:
+            await asyncio.sleep(2 ** attempt)
+    return status, None, {}
+
+async def fetch_documents_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    limiter: Optional[TokenBucket] = None,
+    retries: int = API_RETRIES
+) -> Optional[Dict[str, Any]]:
+    """Fetch one page of documents.json, returning None on failure"""
+    _, data, _ = await request_documents_page(session, url, limiter, retries)
+    return data
+
+class PageStream:
+    """Async iterator over every result page of one documents.json query
+
+    The first page is fetched up front to learn `total_pages`; the remaining
+    pages are fetched concurrently (bounded by `concurrency` and the shared
+    rate limiter) and yielded in completion order. Each page's documents are
+    appended to a compressed NDJSON archive under `raw_dir` as they arrive.
+    Pages that still fail after retries are recorded in `failed_pages` so
+    callers can tell a truncated day from a complete one; the archive of a
+    truncated day is discarded.
+    
+    A stream built from a 304 Not Modified answer (`not_modified`) yields no
+    pages. Once fully consumed, `fingerprint` is an order-independent hash of
+    every document returned, or None if any page failed.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        conditions: Dict[str, str],
+        first_page: Dict[str, Any],
+        raw_dir: str,
+        limiter: Optional[TokenBucket] = None,
+        concurrency: int = PAGE_CONCURRENCY,
+        validators: Optional[Dict[str, str]] = None,
+        not_modified: bool = False
+    ):
+        self.session = session
+        self.conditions = conditions
+        self.first_page = first_page
+        self.raw_dir = raw_dir
+        self.limiter = limiter
+        self.concurrency = max(1, concurrency)
+        self.count = first_page.get("count", 0) or 0
+        self.total_pages = first_page.get("total_pages", 1) or 1
+        self.failed_pages: List[int] = []
+        self.validators = validators or {}
+        self.not_modified = not_modified
+        self._digests: List[str] = []
+        self._complete = False
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        if not self._complete or self.failed_pages:
+            return None
+        return combine_digests(self._digests)
+
+    async def _archive_page(self, archive: NDJSONArchiveWriter, data: Dict[str, Any]) -> None:
+        for doc in data.get("results", []):
+            self._digests.append(document_digest(doc))
+            await archive.write(doc)
+
+    async def _fetch(self, page: int, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            url = build_documents_url(self.conditions, page)
+            data = await fetch_documents_page(self.session, url, self.limiter)
+        return page, data
+
+    async def __aiter__(self):
+        if self.not_modified:
+            return
+        
+        # Documents are archived one per line as each page arrives
+        archive = await NDJSONArchiveWriter(f"{self.raw_dir}/federal_register{ARCHIVE_SUFFIX}").open()
+        tasks = []
+        try:
+            await self._archive_page(archive, self.first_page)
+            yield self.first_page
+            
+            semaphore = asyncio.Semaphore(self.concurrency)
+            tasks = [
+                asyncio.ensure_future(self._fetch(page, semaphore))
+                for page in range(2, self.total_pages + 1)
+            ]
+            for finished in asyncio.as_completed(tasks):
+                page, data = await finished
+                if data is None:
+                    self.failed_pages.append(page)
+                    continue
+                await self._archive_page(archive, data)
+                yield data
+        except BaseException:
+            await archive.abort()
+            raise
+        else:
+            if self.failed_pages:
+                # A truncated day must not replace the last complete archive
+                await archive.abort()
+            else:
+                await archive.close()
+                self._complete = True
+        finally:
+            # Stop outstanding requests if the consumer bails out early
+            for task in tasks:
+                task.cancel()
+
+async def download_federal_register_data(
+    date: datetime,
+    session: aiohttp.ClientSession,
+    limiter: Optional[TokenBucket] = None,
+    manifest: Optional[IngestManifest] = None
+) -> Optional[PageStream]:
+    """Download data from Federal Register API for specific date
+    
+    Returns a PageStream over all result pages, or None when the first page
+    cannot be fetched. When `manifest` holds validators for the day, the
+    request is conditional and a 304 yields a stream marked `not_modified`.
+    """
+    # Format: YYYY-MM-DD
+    date_str = date.strftime('%Y-%m-%d')
+    conditions = {"[publication_date][is]": date_str}
+
     # Create raw data directory
     raw_dir = f"data/raw/{date.strftime('%Y%m%d')}"
     os.makedirs(raw_dir, exist_ok=True)
     
+    headers = manifest.validators(date_str) if manifest else {}
+    status, first_page, validators = await request_documents_page(
+        session, build_documents_url(conditions), limiter, headers=headers or None
+    )
+    if status == 304:
+        logger.info(f"Data for {date_str} not modified since last download")
+        return PageStream(session, conditions, {}, raw_dir, limiter, validators=validators, not_modified=True)
+    if first_page is None:
+        logger.error(f"Error downloading data for {date_str}")
+        return None
+    
+    stream = PageStream(session, conditions, first_page, raw_dir, limiter, validators=validators)
+    logger.info(f"Downloading data for {date_str}: {stream.count} documents in {stream.total_pages} page(s)")
+    return stream
+
+async def download_federal_register_range(
+    start_date: datetime,
+    end_date: datetime,
+    session: aiohttp.ClientSession,
+    limiter: Optional[TokenBucket] = None
+) -> Optional[PageStream]:
+    """Download all documents published in [start_date, end_date] as one paged query"""
+    start_str = start_date.strftime('%Y-%m-%d')
+    end_str = end_date.strftime('%Y-%m-%d')
+    conditions = {
+        "[publication_date][gte]": start_str,
+        "[publication_date][lte]": end_str
+    }
+    
+    raw_dir = f"data/raw/{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+    os.makedirs(raw_dir, exist_ok=True)
+    
+    first_page = await fetch_documents_page(session, build_documents_url(conditions), limiter)
+    if first_page is None:
+        logger.error(f"Error downloading data for {start_str} to {end_str}")
+        return None
+    
+    return PageStream(session, conditions, first_page, raw_dir, limiter)
+
+def new_day_result(date_str: str) -> Dict[str, Any]:
+    """Create the per-day result record that travels through the pipeline stages"""
+    return {
+        "date": date_str,
+        "downloaded": False,
+        "documents": 0,
+        "added": 0,
+        "updated": 0,
+        "embedded": 0,
+        "started": time.monotonic()
+    }
+
+async def download_day(
+    day: Dict[str, Any],
+    session: aiohttp.ClientSession,
+    limiter: Optional[TokenBucket] = None,
+    manifest: Optional[IngestManifest] = None,
+    force: bool = False
+) -> Dict[str, Any]:
+    """Download stage: fetch a day's first result page
+    
+    The day carries the PageStream on to the process stage, which consumes
+    the remaining pages as they arrive. Days the API answers 304 Not
+    Modified for are marked `unchanged` and carry no pages.
+    """
+    pages = await download_federal_register_data(
+        datetime.strptime(day["date"], "%Y-%m-%d"), session, limiter, None if force else manifest
+    )
+    if not pages:
+        day["error"] = "Failed to download data"
+        return day
+    
+    day["downloaded"] = True
+    if pages.not_modified:
+        day["unchanged"] = True
+        return day
+    
+    day["pages"] = pages
+    day["fetched"] = pages.count
+    return day
+
+async def process_day(
+    day: Dict[str, Any],
+    manifest: Optional[IngestManifest] = None,
+    force: bool = False
+) -> Dict[str, Any]:
+    """Process stage: normalize a day's pages as they are downloaded
+    
+    Once a PageStream is consumed, days with failed pages are marked failed
+    and days whose content fingerprint matches the last successful ingest
+    are marked `unchanged` and carry no records, so the insert stage skips
+    them.
+    """
+    pages = day.pop("pages", None)
+    if pages is None:
+        return day
+    
+    publication_date = datetime.strptime(day["date"], "%Y-%m-%d")
     try:
-        async with aiohttp.ClientSession() as session:
-            # Add rate limiting to avoid API throttling
-            await asyncio.sleep(1)  # Simple rate limiting
-            
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    # Save raw data
-                    async with aiofiles.open(f"{raw_dir}/federal_register.json", "w") as f:
-                        await f.write(json.dumps(data, indent=2))
-                    
-                    logger.info(f"Successfully downloaded data for {date_str}")
-                    return data
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Error downloading data for {date_str}: HTTP {response.status} - {error_text}")
-                    return None
+        if isinstance(pages, PageStream):
+            # Closing the generator stops outstanding page requests if processing fails
+            async with aclosing(pages.__aiter__()) as stream:
+                day["records"] = await process_federal_register_data(stream, publication_date)
+        else:
+            day["records"] = await process_federal_register_data(pages, publication_date)
     except Exception as e:
-        logger.error(f"Exception downloading data for {date_str}: {str(e)}")
-        return None
+        # A failed day keeps no fingerprint in the manifest, so the next run retries it
+        day["error"] = f"Failed to process documents: {str(e)}"
+        day["records"] = []
+    
+    if isinstance(pages, PageStream) and "error" not in day:
+        if pages.failed_pages:
+            day["error"] = f"Failed to download pages {sorted(pages.failed_pages)}"
+        elif not force and manifest and manifest.is_unchanged(day["date"], pages.fingerprint):
+            logger.info(f"Data for {day['date']} unchanged since last ingest, skipping")
+            day["unchanged"] = True
+            day["records"] = []
+        else:
+            day["fingerprint"] = pages.fingerprint
+            day["validators"] = pages.validators
+    
+    day["documents"] = len(day["records"])
+    return day
 
-async def save_checkpoint(date: datetime) -> None:
-    """Save checkpoint of last processed date"""
-    async with aiofiles.open(CHECKPOINT_FILE, "w") as f:
-        await f.write(date.strftime("%Y-%m-%d"))
-    logger.info(f"Updated checkpoint to {date.strftime('%Y-%m-%d')}")
+async def store_day(day: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert stage: write a day's documents to the database"""
+    records = day.get("records")
+    if records:
+        db_result = await insert_documents(records)
+        day["added"] = db_result.get("added", 0)
+        day["updated"] = db_result.get("updated", 0)
+        if "error" in db_result:
+            day["error"] = db_result["error"]
+    return day
+
+async def enrich_day(day: Dict[str, Any]) -> Dict[str, Any]:
+    """Enrich stage: embed the day's new and changed documents"""
+    records = day.pop("records", None)
+    if records and "error" not in day:
+        try:
+            day["embedded"] = await enrich_documents(records)
+        except Exception as e:
+            # Failing the day makes the next run retry; stored documents are skipped by hash
+            logger.error(f"Error embedding documents for {day['date']}: {str(e)}")
+            day["error"] = f"Failed to embed documents: {str(e)}"
+    
+    day["duration"] = round(time.monotonic() - day.pop("started"), 3)
+    return day
 
-async def load_checkpoint() -> Optional[datetime]:
-    """Load last processed date from checkpoint"""
+def build_stages(
+    download_workers: Optional[int] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    limiter: Optional[TokenBucket] = None,
+    process_workers: int = PROCESS_WORKERS,
+    insert_workers: int = INSERT_WORKERS,
+    manifest: Optional[IngestManifest] = None,
+    force: bool = False
+) -> List[Stage]:
+    """Build the download -> process -> insert -> enrich stages (download only when a session is given)"""
+    stages = []
+    if session is not None:
+        stages.append(Stage(
+            "download",
+            lambda day: download_day(day, session, limiter, manifest, force),
+            download_workers or PIPELINE_CONCURRENCY,
+            lambda day: day.get("fetched", 0)
+        ))
+    stages.append(Stage(
+        "process",
+        lambda day: process_day(day, manifest, force),
+        process_workers,
+        lambda day: day["documents"]
+    ))
+    stages.append(Stage("insert", store_day, insert_workers, lambda day: day["added"] + day["updated"]))
+    stages.append(Stage("enrich", enrich_day, insert_workers, lambda day: day["embedded"]))
+    return stages
+
+async def collect_day_result(results: Dict[str, Any], day: Dict[str, Any], manifest: IngestManifest) -> None:
+    """Record one finished day in the manifest and fold it into the run totals"""
     try:
-        if os.path.exists(CHECKPOINT_FILE):
-            async with aiofiles.open(CHECKPOINT_FILE, "r") as f:
-                date_str = await f.read()
-                date_str = date_str.strip()
-                return datetime.strptime(date_str, "%Y-%m-%d")
+        await manifest.record_day(day)
     except Exception as e:
-        logger.error(f"Error loading checkpoint: {str(e)}")
+        # Unrecorded days are pending, so the next run retries this one
+        logger.error(f"Error recording {day['date']} in the ingest manifest: {str(e)}")
+        day.setdefault("error", f"Failed to record day: {str(e)}")
+    day.pop("fingerprint", None)
+    day.pop("validators", None)
     
-    # Default to 7 days ago if no checkpoint
-    return datetime.now() - timedelta(days=7)
+    results["days"].append(day)
+    if day["downloaded"]:
+        results["days_processed"] += 1
+    if day.get("unchanged"):
+        results["days_unchanged"] += 1
+    results["documents_added"] += day["added"]
+    results["documents_updated"] += day["updated"]
+    results["documents_embedded"] += day["embedded"]
+    if "error" in day:
+        results["errors"] += 1
+
+def fail_day_result(day: Dict[str, Any], stage: str, error: Exception) -> Dict[str, Any]:
+    """Mark a day whose stage handler raised as failed, so the next run retries it"""
+    day["error"] = f"Error in {stage} stage: {str(error)}"
+    day.pop("pages", None)
+    day.pop("records", None)
+    started = day.pop("started", None)
+    if started is not None:
+        day["duration"] = round(time.monotonic() - started, 3)
+    return day
 
-async def run_pipeline(days_back: int = 7) -> Dict[str, Any]:
-    """Run complete pipeline for the last N days"""
+async def run_pipeline(
+    days_back: int = 7,
+    concurrency: int = PIPELINE_CONCURRENCY,
+    process_workers: int = PROCESS_WORKERS,
+    insert_workers: int = INSERT_WORKERS,
+    force: bool = False,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    overlap_days: int = PIPELINE_OVERLAP_DAYS
+) -> Dict[str, Any]:
+    """Run complete pipeline for the last N days (or an explicit date range)
+    
+    The last N days end with, and include, `end_date` (today by default), so
+    days_back=1 runs just that day.
+    
+    Download, process, insert and enrich run as overlapping stages joined by bounded
+    queues, with `concurrency` download workers sharing one session and a
+    token-bucket rate limit. Per-stage throughput is reported under "stages".
+    
+    Only days the ingest manifest has no successful record of are run, plus
+    the latest `overlap_days` days, which the API may still be filling in.
+    Unchanged days are then skipped by fingerprint. `force` runs and
+    re-ingests every day in the range.
+    """
     # Initialize database
     await init_db()
 
-    # Fix the date order - start date must be before end date
-    # datetime(2023, 1, 1) ~ year month date
-    # start_date = datetime(2023, 1, 1)
-    # end_date = datetime(2023, 5, 1)
-    start_date = datetime.now() - timedelta(days=30)
-    end_date = datetime.now()
-
-    # Check for checkpoint
-    checkpoint_date = await load_checkpoint()
-    if checkpoint_date and checkpoint_date > start_date and checkpoint_date < end_date:
-        start_date = checkpoint_date
+    end_date = end_date or datetime.now()
+    default_start = end_date - timedelta(days=max(days_back, 1) - 1)
+    start_date = start_date or default_start
 
     # Ensure start_date <= end_date
     if start_date > end_date:
         logger.error("Start date is after end date. Adjusting to default range.")
-        start_date = end_date - timedelta(days=7)
-    
-    logger.info(f"Running pipeline from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+        start_date = default_start
     
-    # Process each day
+    dates = []
     current_date = start_date
+    while current_date.date() <= end_date.date():
+        dates.append(current_date.strftime("%Y-%m-%d"))
+        current_date += timedelta(days=1)
+    
+    # Resume from the manifest: missing and failed days, plus the recent overlap
+    manifest = IngestManifest()
+    if not force:
+        pending = set(manifest.pending_days(dates))
+        pending.update(dates[-overlap_days:] if overlap_days > 0 else [])
+        dates = [date_str for date_str in dates if date_str in pending]
+    
+    logger.info(
+        f"Running pipeline from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}: "
+        f"{len(dates)} day(s) to run with {concurrency} download, {process_workers} process "
+        f"and {insert_workers} insert worker(s)"
+    )
+    
     results = {
         "days_processed": 0,
+        "days_unchanged": 0,
         "documents_added": 0,
         "documents_updated": 0,
-        "errors": 0
+        "documents_embedded": 0,
+        "errors": 0,
+        "days": []
     }
     
+    async def on_day_finished(day: Dict[str, Any]) -> None:
+        await collect_day_result(results, day, manifest)
+    
+    async def on_day_failed(day: Dict[str, Any], stage: str, error: Exception) -> None:
+        await collect_day_result(results, fail_day_result(day, stage, error), manifest)
+    
+    limiter = create_rate_limiter()
+    async with create_session(concurrency * PAGE_CONCURRENCY) as session:
+        results["stages"] = await run_stages(
+            (new_day_result(date_str) for date_str in dates),
+            build_stages(concurrency, session, limiter, process_workers, insert_workers, manifest, force),
+            STAGE_QUEUE_SIZE,
+            on_day_finished,
+            on_day_failed
+        )
+    
+    results["days"].sort(key=lambda day: day["date"])
+    await publish_vector_index(results["documents_embedded"])
+    
+    logger.info(
+        f"Pipeline completed: {results['days_processed']} days ({results['days_unchanged']} unchanged), "
+        f"{results['documents_added']} added, {results['documents_updated']} updated, "
+        f"{results['errors']} errors"
+    )
+    return results
+
+async def iter_bulk_windows(
+    start_date: datetime,
+    end_date: datetime,
+    window_days: int,
+    session: aiohttp.ClientSession,
+    limiter: Optional[TokenBucket],
+    results: Dict[str, Any]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Page through adaptive date-range windows, yielding one item per publication day"""
+    current_date = start_date
+    
     while current_date <= end_date:
-        # Download data for the day
-        data = await download_federal_register_data(current_date)
+        window_days = max(1, min(window_days, BULK_MAX_WINDOW_DAYS))
+        window_end = min(current_date + timedelta(days=window_days - 1), end_date)
+        window_label = f"{current_date.strftime('%Y-%m-%d')} to {window_end.strftime('%Y-%m-%d')}"
         
-        if data:
-            # Process the data
-            processed_data = await process_federal_register_data(data, current_date)
-            
-            # Enrich documents (optional enhancement)
-            enriched_data = await enrich_documents(processed_data)
-            
-            # Insert into database
-            if enriched_data:
-                db_result = await insert_documents(enriched_data)
-                results["documents_added"] += db_result.get("added", 0)
-                results["documents_updated"] += db_result.get("updated", 0)
-                if "error" in db_result:
-                    results["errors"] += 1
-            
-            results["days_processed"] += 1
+        pages = await download_federal_register_range(current_date, window_end, session, limiter)
+        results["requests"] += 1
         
-        # Save checkpoint after each day
-        await save_checkpoint(current_date)
+        if pages is None:
+            results["errors"] += 1
+            results["windows"].append({"window": window_label, "error": "Failed to download data"})
+            current_date = window_end + timedelta(days=1)
+            continue
         
-        # Move to next day
-        current_date += timedelta(days=1)
+        # Too many results for one query: split the window and retry
+        if pages.count > API_MAX_RESULTS and window_end > current_date:
+            window_days = max(1, (window_end - current_date).days // 2)
+            logger.info(f"Window {window_label} has {pages.count} documents, shrinking to {window_days} days")
+            continue
+        
+        documents_by_date: Dict[str, List[Dict[str, Any]]] = {}
+        async for page in pages:
+            for doc in page.get("results", []):
+                documents_by_date.setdefault(doc.get("publication_date") or current_date.strftime("%Y-%m-%d"), []).append(doc)
+        results["requests"] += pages.total_pages - 1
+        
+        window_result = {"window": window_label, "documents": pages.count, "pages": pages.total_pages}
+        if pages.failed_pages:
+            window_result["error"] = f"Failed to download pages {sorted(pages.failed_pages)}"
+            results["errors"] += 1
+        results["windows"].append(window_result)
+        logger.info(f"Window {window_label}: {pages.count} documents over {len(documents_by_date)} publication days")
+        
+        # Hand every day of the window to the process/insert stages while the next
+        # window downloads; empty days are still yielded so the manifest records them
+        window_dates = set(documents_by_date)
+        day_date = current_date
+        while day_date <= window_end:
+            window_dates.add(day_date.strftime("%Y-%m-%d"))
+            day_date += timedelta(days=1)
+        
+        for date_str in sorted(window_dates):
+            documents = documents_by_date.get(date_str, [])
+            day = new_day_result(date_str)
+            day["downloaded"] = True
+            day["fetched"] = len(documents)
+            if documents:
+                day["pages"] = [{"results": documents}]
+            if pages.failed_pages:
+                day["error"] = window_result["error"]
+            else:
+                # Same fingerprint a per-day download would produce, so daily runs can skip these days
+                day["fingerprint"] = combine_digests(document_digest(doc) for doc in documents)
+            yield day
+        
+        # Resize the next window towards the target result volume
+        span = (window_end - current_date).days + 1
+        per_day = pages.count / span
+        window_days = int(BULK_TARGET_RESULTS / per_day) if per_day else span * 2
+        current_date = window_end + timedelta(days=1)
+
+async def run_bulk_pipeline(
+    start_date: datetime,
+    end_date: datetime,
+    window_days: int = BULK_WINDOW_DAYS,
+    process_workers: int = PROCESS_WORKERS,
+    insert_workers: int = INSERT_WORKERS
+) -> Dict[str, Any]:
+    """Backfill a date range using publication_date[gte]/[lte] windows
+    
+    Each window is paged through once and its documents are processed grouped
+    by their real publication date, so weekends and holidays cost nothing.
+    The window size adapts to result volume: windows over the API result cap
+    are split, and the next window is resized towards BULK_TARGET_RESULTS.
+    Every day in the range is recorded in the ingest manifest.
+    """
+    await init_db()
+    
+    logger.info(
+        f"Running bulk pipeline from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')} "
+        f"with {window_days}-day windows"
+    )
+    
+    results = {
+        "days_processed": 0,
+        "days_unchanged": 0,
+        "documents_added": 0,
+        "documents_updated": 0,
+        "documents_embedded": 0,
+        "errors": 0,
+        "requests": 0,
+        "windows": [],
+        "days": []
+    }
+    
+    manifest = IngestManifest()
     
-    logger.info(f"Pipeline completed: {results}")
+    async def on_day_finished(day: Dict[str, Any]) -> None:
+        await collect_day_result(results, day, manifest)
+    
+    async def on_day_failed(day: Dict[str, Any], stage: str, error: Exception) -> None:
+        await collect_day_result(results, fail_day_result(day, stage, error), manifest)
+    
+    limiter = create_rate_limiter()
+    async with create_session(PAGE_CONCURRENCY) as session:
+        results["stages"] = await run_stages(
+            iter_bulk_windows(start_date, end_date, window_days, session, limiter, results),
+            build_stages(process_workers=process_workers, insert_workers=insert_workers),
+            STAGE_QUEUE_SIZE,
+            on_day_finished,
+            on_day_failed
+        )
+    
+    results["days"].sort(key=lambda day: day["date"])
+    await publish_vector_index(results["documents_embedded"])
+    
+    logger.info(
+        f"Bulk pipeline completed: {results['days_processed']} days, "
+        f"{results['documents_added']} added, {results['documents_updated']} updated, "
+        f"{results['requests']} requests, {results['errors']} errors"
+    )
     return results
 
 async def run_single_day(date_str: Optional[str] = None) -> Dict[str, Any]:
@@ -173,37 +706,127 @@ async def run_single_day(date_str: Optional[str] = None) -> Dict[str, Any]:
     
     logger.info(f"Running pipeline for {target_date.strftime('%Y-%m-%d')}")
     
+    manifest = IngestManifest()
+    day = new_day_result(target_date.strftime("%Y-%m-%d"))
+    
     # Download data
-    data = await download_federal_register_data(target_date)
+    async with create_session() as session:
+        day = await download_day(day, session, create_rate_limiter(), manifest)
     
-    if not data:
+    if not day["downloaded"]:
         return {"error": "Failed to download data"}
     
-    # Process the data
-    processed_data = await process_federal_register_data(data, target_date)
-    
-    # Enrich documents (optional)
-    enriched_data = await enrich_documents(processed_data)
+    # Process, insert and enrich the documents
+    day = await enrich_day(await store_day(await process_day(day, manifest)))
     
-    # Insert into database
-    result = await insert_documents(enriched_data)
+    # Record the day in the ingest manifest
+    await manifest.record_day(day)
+    await publish_vector_index(day["embedded"])
     
-    # Save checkpoint
-    await save_checkpoint(target_date)
+    result = {"added": day["added"], "updated": day["updated"], "embedded": day["embedded"]}
+    if day.get("unchanged"):
+        result["unchanged"] = True
+    if "error" in day:
+        result["error"] = day["error"]
     
     logger.info(f"Single day pipeline completed: {result}")
     return result
 
+async def run_embedding_backfill() -> int:
+    """Embed every stored document without up-to-date embeddings, then publish the index"""
+    await init_db()
+    embedded = await backfill_embeddings()
+    await publish_vector_index(embedded)
+    return embedded
+
+async def run_partition_documents() -> bool:
+    """Bring the schema up to date, then partition the documents table"""
+    await init_db()
+    return await partition_documents()
+
+async def run_archive_partition(year: int) -> int:
+    """Archive one publication year, then republish the vector index without it"""
+    archived = await archive_documents_partition(year)
+    if archived:
+        await build_vector_index()
+    return archived
+
+async def run_and_close_pool(coro):
+    """Run a pipeline entry point, then release the shared database pool"""
+    try:
+        return await coro
+    finally:
+        await close_pool()
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Federal Register Data Pipeline')
     parser.add_argument('--days', type=int, default=7, help='Number of days to process (default: 7)')
     parser.add_argument('--date', type=str, help='Single date to process (format: YYYY-MM-DD)')
+    parser.add_argument('--concurrency', type=int, default=PIPELINE_CONCURRENCY,
+                        help=f'Number of days downloaded concurrently (default: {PIPELINE_CONCURRENCY})')
+    parser.add_argument('--process-workers', type=int, default=PROCESS_WORKERS,
+                        help=f'Number of processing workers (default: {PROCESS_WORKERS})')
+    parser.add_argument('--insert-workers', type=int, default=INSERT_WORKERS,
+                        help=f'Number of database insert workers (default: {INSERT_WORKERS})')
+    parser.add_argument('--force', action='store_true', help='Re-run every day in the range, even if already ingested and unchanged')
+    parser.add_argument('--bulk', action='store_true', help='Backfill using date-range windows instead of one request per day')
+    parser.add_argument('--start', type=str, help='Start date (format: YYYY-MM-DD, default: --days ago)')
+    parser.add_argument('--end', type=str, help='End date (format: YYYY-MM-DD, default: today)')
+    parser.add_argument('--overlap', type=int, default=PIPELINE_OVERLAP_DAYS,
+                        help=f'Most recent days re-checked even if already ingested (default: {PIPELINE_OVERLAP_DAYS})')
+    parser.add_argument('--replay', action='store_true',
+                        help='Rebuild the database from the data/raw archive without calling the API')
+    parser.add_argument('--replay-workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes parsing the raw archive (default: CPU count)')
+    parser.add_argument('--window', type=int, default=BULK_WINDOW_DAYS,
+                        help=f'Initial bulk window size in days (default: {BULK_WINDOW_DAYS})')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='Recompute the document statistics rollup from the documents table')
+    parser.add_argument('--build-index', action='store_true',
+                        help='Rebuild the memory-mapped vector index from the stored embeddings')
+    parser.add_argument('--backfill-embeddings', action='store_true',
+                        help='Embed stored documents that have no up-to-date embeddings')
+    parser.add_argument('--analyze', action='store_true',
+                        help='Refresh the database optimizer statistics (ANALYZE TABLE)')
+    parser.add_argument('--partition-documents', action='store_true',
+                        help='Range-partition the documents table by publication year (MySQL, rewrites the table)')
+    parser.add_argument('--archive-partition', type=int, metavar='YEAR',
+                        help='Move one publication year out of the partitioned documents table')
     
     args = parser.parse_args()
     
-    if args.date:
-        asyncio.run(run_single_day(args.date))
+    if args.rebuild_stats:
+        asyncio.run(run_and_close_pool(rebuild_stats()))
+    elif args.build_index:
+        asyncio.run(run_and_close_pool(build_vector_index()))
+    elif args.backfill_embeddings:
+        asyncio.run(run_and_close_pool(run_embedding_backfill()))
+    elif args.analyze:
+        asyncio.run(run_and_close_pool(analyze_tables()))
+    elif args.partition_documents:
+        asyncio.run(run_and_close_pool(run_partition_documents()))
+    elif args.archive_partition:
+        asyncio.run(run_and_close_pool(run_archive_partition(args.archive_partition)))
+    elif args.date:
+        asyncio.run(run_and_close_pool(run_single_day(args.date)))
+    elif args.replay:
+        from pipeline.replay import run_replay
+        replay_start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+        replay_end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else None
+        asyncio.run(run_and_close_pool(run_replay(start_date=replay_start, end_date=replay_end,
+                                                  workers=args.replay_workers, insert_workers=args.insert_workers)))
+    elif args.bulk:
+        bulk_end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.now()
+        bulk_start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else bulk_end - timedelta(days=max(args.days, 1) - 1)
+        asyncio.run(run_and_close_pool(
+            run_bulk_pipeline(bulk_start, bulk_end, args.window, args.process_workers, args.insert_workers)
+        ))
     else:
-        asyncio.run(run_pipeline(args.days)) 
\ No newline at end of file
+        asyncio.run(run_and_close_pool(run_pipeline(
+            args.days, args.concurrency, args.process_workers, args.insert_workers, args.force,
+            start_date=datetime.strptime(args.start, "%Y-%m-%d") if args.start else None,
+            end_date=datetime.strptime(args.end, "%Y-%m-%d") if args.end else None,
+            overlap_days=args.overlap
+        )))
@@ -1,11 +1,18 @@
-import json
 import asyncio
-import aiofiles
 import os
+import sys
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union, AsyncIterable, AsyncIterator
 import logging
 
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.archive import NDJSONArchiveWriter, ARCHIVE_SUFFIX
+from db_common import compute_content_hash, canonical_document_type
+from db_backend import get_embedding_candidates, replace_embeddings
+from search.embeddings import HashingEmbedder, chunk_document
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,8 +20,63 @@ logging.basicConfig(
 )
 logger = logging.getLogger("processor")
 
-async def process_federal_register_data(data: Dict[str, Any], date: datetime) -> List[Dict[str, Any]]:
-    """Process downloaded Federal Register data into a consistent format"""
+# Documents chunked and embedded per vectorized batch
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+
+embedder = HashingEmbedder()
+
+def normalize_document(doc: Dict[str, Any], date: datetime) -> Optional[Dict[str, Any]]:
+    """Normalize one API result into the document format stored in the database
+    
+    Returns None for documents that cannot be stored (no document number).
+    """
+    processed_doc = {
+        "document_number": doc.get("document_number"),
+        "title": doc.get("title"),
+        "publication_date": doc.get("publication_date"),
+        "document_type": doc.get("document_type"),
+        "abstract": doc.get("abstract", ""),
+        "html_url": doc.get("html_url"),
+        "pdf_url": doc.get("pdf_url"),
+        "type": doc.get("type"),
+        "subtype": doc.get("subtype")
+    }
+    
+    # Clean and validate fields
+    if not processed_doc["document_number"]:
+        return None  # Skip documents without a document number
+        
+    if not processed_doc["title"]:
+        processed_doc["title"] = "Untitled Document"
+        
+    # Ensure publication date is in YYYY-MM-DD format
+    if isinstance(processed_doc["publication_date"], str):
+        try:
+            # Validate and normalize date format
+            parsed_date = datetime.strptime(processed_doc["publication_date"], "%Y-%m-%d")
+            processed_doc["publication_date"] = parsed_date.strftime("%Y-%m-%d")
+        except ValueError:
+            # If invalid date, use the provided date
+            processed_doc["publication_date"] = date.strftime("%Y-%m-%d")
+    else:
+        processed_doc["publication_date"] = date.strftime("%Y-%m-%d")
+    
+    processed_doc["document_type"] = canonical_document_type(processed_doc)
+    
+    # Fingerprint the stored fields so unchanged documents can skip the database write
+    processed_doc["content_hash"] = compute_content_hash(processed_doc)
+    
+    return processed_doc
+
+async def process_federal_register_data(
+    data: Union[Dict[str, Any], List[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+    date: datetime
+) -> List[Dict[str, Any]]:
+    """Process downloaded Federal Register data into a consistent format
+    
+    `data` is a single API response, a list of result pages, or an async
+    stream of result pages, which are processed as they arrive.
+    """
     processed_documents = []
     
     # Create processed directory if not exists
@@ -22,66 +84,94 @@ async def process_federal_register_data(data: Dict[str, Any], date: datetime) ->
     os.makedirs(processed_dir, exist_ok=True)
     
     try:
-        # Extract documents from API response
-        documents = data.get("results", [])
+        if isinstance(data, dict):
+            pages = _iter_pages([data])
+        elif isinstance(data, list):
+            pages = _iter_pages(data)
+        else:
+            pages = data
         
-        for doc in documents:
-            processed_doc = {
-                "document_number": doc.get("document_number"),
-                "title": doc.get("title"),
-                "publication_date": doc.get("publication_date"),
-                "document_type": doc.get("document_type"),
-                "abstract": doc.get("abstract", ""),
-                "html_url": doc.get("html_url"),
-                "pdf_url": doc.get("pdf_url"),
-                "type": doc.get("type"),
-                "subtype": doc.get("subtype")
-            }
-            
-            # Clean and validate fields
-            if not processed_doc["document_number"]:
-                continue  # Skip documents without a document number
-                
-            if not processed_doc["title"]:
-                processed_doc["title"] = "Untitled Document"
-                
-            # Ensure publication date is in YYYY-MM-DD format
-            if isinstance(processed_doc["publication_date"], str):
-                try:
-                    # Validate and normalize date format
-                    parsed_date = datetime.strptime(processed_doc["publication_date"], "%Y-%m-%d")
-                    processed_doc["publication_date"] = parsed_date.strftime("%Y-%m-%d")
-                except ValueError:
-                    # If invalid date, use the provided date
-                    processed_doc["publication_date"] = date.strftime("%Y-%m-%d")
-            else:
-                processed_doc["publication_date"] = date.strftime("%Y-%m-%d")
-            
-            processed_documents.append(processed_doc)
-        
-        # Save processed data
-        async with aiofiles.open(f"{processed_dir}/processed_documents.json", "w") as f:
-            await f.write(json.dumps(processed_documents, indent=2))
+        # Processed documents are streamed to a compressed NDJSON archive
+        async with NDJSONArchiveWriter(f"{processed_dir}/processed_documents{ARCHIVE_SUFFIX}") as archive:
+            async for page in pages:
+                # Extract documents from API response
+                for doc in page.get("results", []):
+                    processed_doc = normalize_document(doc, date)
+                    if processed_doc:
+                        processed_documents.append(processed_doc)
+                        await archive.write(processed_doc)
         
         logger.info(f"Processed {len(processed_documents)} documents for {date.strftime('%Y-%m-%d')}")
         return processed_documents
         
     except Exception as e:
         logger.error(f"Error processing data for {date.strftime('%Y-%m-%d')}: {str(e)}")
+        raise
+
+async def _iter_pages(pages: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    for page in pages:
+        yield page
+
+def _embed_batch(documents: List[Dict[str, Any]]) -> List[Tuple[int, int, str, bytes, str]]:
+    """Chunk and embed a batch of documents into vector_embeddings rows"""
+    texts = []
+    owners = []
+    for doc in documents:
+        for chunk_index, chunk in enumerate(chunk_document(doc.get("title"), doc.get("abstract"))):
+            texts.append(chunk)
+            owners.append((doc, chunk_index))
+    if not texts:
         return []
+    
+    # One vectorized call per batch; rows are stored as packed float32
+    vectors = embedder.embed(texts).astype("<f4", copy=False)
+    return [
+        (doc["id"], chunk_index, text, vectors[row].tobytes(), doc["content_hash"])
+        for row, ((doc, chunk_index), text) in enumerate(zip(owners, texts))
+    ]
+
+async def embed_documents(candidates: List[Dict[str, Any]], batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """Replace the chunk embeddings of stored documents, batch by batch"""
+    loop = asyncio.get_running_loop()
+    embedded = 0
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        rows = await loop.run_in_executor(None, _embed_batch, batch)
+        await replace_embeddings([doc["id"] for doc in batch], rows)
+        embedded += len(batch)
+    return embedded
 
-async def enrich_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Enrich documents with additional metadata (optional enhancement)
+async def enrich_documents(documents: List[Dict[str, Any]], batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """Enrich stored documents with chunk embeddings for semantic search
     
-    This function could be expanded to:
-    1. Extract keywords from abstracts
-    2. Add sentiment analysis
-    3. Link related documents
-    4. Add readability scores
+    Must run after the documents are inserted. Only documents whose stored
+    embeddings are missing or were computed from a different content_hash
+    are chunked and embedded, so unchanged documents cost one indexed lookup.
+    Returns the number of documents (re)embedded.
     """
-    # For now, just return the original documents
-    # This is a placeholder for future enhancements
-    return documents
+    numbers = [doc["document_number"] for doc in documents if doc.get("document_number")]
+    embedded = 0
+    for start in range(0, len(numbers), batch_size):
+        candidates = await get_embedding_candidates(numbers[start:start + batch_size])
+        embedded += await embed_documents(candidates, batch_size)
+    
+    if embedded:
+        logger.info(f"Embedded {embedded} new or changed documents")
+    return embedded
+
+async def backfill_embeddings(batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """Embed every stored document that has no up-to-date embeddings"""
+    embedded = 0
+    after_id = 0
+    while True:
+        candidates = await get_embedding_candidates(after_id=after_id, limit=batch_size)
+        if not candidates:
+            break
+        embedded += await embed_documents(candidates, batch_size)
+        after_id = candidates[-1]["id"]
+    
+    logger.info(f"Backfilled embeddings for {embedded} documents")
+    return embedded
 
 async def generate_document_summary(abstract: str) -> str:
     """Generate a shorter summary of document abstracts (optional)
@@ -0,0 +1,223 @@
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Iterator
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.archive import iter_archive, ARCHIVE_SUFFIX
+from pipeline.processor import normalize_document, enrich_documents
+from pipeline.stages import Stage, run_stages
+from db_backend import init_db, insert_documents
+from search.semantic import publish_vector_index
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("replay")
+
+RAW_DATA_DIR = "data/raw"
+REPLAY_WORKERS = int(os.getenv("REPLAY_WORKERS", os.cpu_count() or 1))
+INSERT_WORKERS = int(os.getenv("INSERT_WORKERS", 2))
+STAGE_QUEUE_SIZE = int(os.getenv("STAGE_QUEUE_SIZE", 8))
+
+def _directory_dates(name: str) -> Optional[Tuple[datetime, datetime]]:
+    """Parse a raw archive directory name (YYYYMMDD or YYYYMMDD_YYYYMMDD)"""
+    try:
+        parts = name.split("_")
+        start = datetime.strptime(parts[0], "%Y%m%d")
+        end = datetime.strptime(parts[-1], "%Y%m%d")
+        return start, end
+    except ValueError:
+        return None
+
+def scan_raw_archive(
+    raw_dir: str = RAW_DATA_DIR,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[str]:
+    """List archived day/window directories overlapping [start_date, end_date]
+
+    A bulk window directory may only partly overlap the range; its documents
+    are filtered by publication date when loaded.
+    """
+    directories = []
+    if not os.path.isdir(raw_dir):
+        return directories
+
+    for name in sorted(os.listdir(raw_dir)):
+        path = os.path.join(raw_dir, name)
+        dates = _directory_dates(name)
+        if not dates or not os.path.isdir(path):
+            continue
+        if start_date and dates[1] < start_date:
+            continue
+        if end_date and dates[0] > end_date:
+            continue
+        directories.append(path)
+    return directories
+
+def iter_raw_documents(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the raw API documents archived in one directory
+
+    Reads legacy whole-page JSON files as well as compressed NDJSON archives.
+    Legacy files come first, so a re-download archived as NDJSON wins over
+    them when documents are de-duplicated.
+    """
+    for file_path in sorted(glob.glob(os.path.join(path, "federal_register*.json"))):
+        with open(file_path, "r") as f:
+            data = json.load(f)
+        yield from data.get("results", [])
+
+    for file_path in sorted(glob.glob(os.path.join(path, f"federal_register*{ARCHIVE_SUFFIX}"))):
+        yield from iter_archive(file_path)
+
+def load_raw_directory(
+    path: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Parse and normalize every archived page in one raw directory
+
+    Runs in a worker process. Only documents published within
+    [start_date, end_date] (YYYY-MM-DD, inclusive) are kept. Documents are
+    de-duplicated by document number, keeping the last occurrence.
+    """
+    fallback_date = _directory_dates(os.path.basename(path))[0]
+    documents: Dict[str, Dict[str, Any]] = {}
+
+    for doc in iter_raw_documents(path):
+        processed_doc = normalize_document(doc, fallback_date)
+        if not processed_doc:
+            continue
+        if start_date and processed_doc["publication_date"] < start_date:
+            continue
+        if end_date and processed_doc["publication_date"] > end_date:
+            continue
+        documents[processed_doc["document_number"]] = processed_doc
+
+    return path, list(documents.values())
+
+async def iter_replay_days(
+    directories: List[str],
+    workers: int,
+    results: Dict[str, Any],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Parse raw directories in a process pool, yielding documents grouped by publication date
+
+    At most `workers` directories are submitted at a time, and the next one
+    only once a parsed directory has been taken, so parsed results cannot
+    pile up ahead of the insert stage.
+    """
+    loop = asyncio.get_running_loop()
+    workers = max(1, workers)
+    start_str = start_date.strftime("%Y-%m-%d") if start_date else None
+    end_str = end_date.strftime("%Y-%m-%d") if end_date else None
+    remaining = iter(directories)
+    in_flight = set()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit_next() -> None:
+            path = next(remaining, None)
+            if path is not None:
+                in_flight.add(loop.run_in_executor(executor, load_raw_directory, path, start_str, end_str))
+
+        for _ in range(workers):
+            submit_next()
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            finished = done.pop()
+            in_flight.discard(finished)
+            submit_next()
+            try:
+                path, documents = finished.result()
+            except Exception as e:
+                logger.error(f"Error parsing raw archive: {str(e)}")
+                results["errors"] += 1
+                continue
+
+            results["directories_replayed"] += 1
+            documents_by_date: Dict[str, List[Dict[str, Any]]] = {}
+            for doc in documents:
+                documents_by_date.setdefault(doc["publication_date"], []).append(doc)
+            for date_str in sorted(documents_by_date):
+                yield {"date": date_str, "source": path, "records": documents_by_date[date_str]}
+
+async def store_replayed_day(day: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert and enrich stage for replayed documents"""
+    records = day.pop("records")
+    db_result = await insert_documents(records)
+    day["added"] = db_result.get("added", 0)
+    day["updated"] = db_result.get("updated", 0)
+    day["embedded"] = 0
+    if "error" in db_result:
+        day["error"] = db_result["error"]
+        return day
+    
+    try:
+        day["embedded"] = await enrich_documents(records)
+    except Exception as e:
+        logger.error(f"Error embedding replayed documents for {day['date']}: {str(e)}")
+        day["error"] = str(e)
+    return day
+
+async def run_replay(
+    raw_dir: str = RAW_DATA_DIR,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    workers: int = REPLAY_WORKERS,
+    insert_workers: int = INSERT_WORKERS
+) -> Dict[str, Any]:
+    """Rebuild the database from the raw archive without touching the API"""
+    await init_db()
+
+    directories = scan_raw_archive(raw_dir, start_date, end_date)
+    logger.info(f"Replaying {len(directories)} archived directories from {raw_dir} with {workers} parser process(es)")
+
+    results = {
+        "directories_replayed": 0,
+        "days_processed": 0,
+        "documents_added": 0,
+        "documents_updated": 0,
+        "documents_embedded": 0,
+        "errors": 0
+    }
+    started = time.monotonic()
+
+    async def on_day_finished(day: Dict[str, Any]) -> None:
+        results["days_processed"] += 1
+        results["documents_added"] += day["added"]
+        results["documents_updated"] += day["updated"]
+        results["documents_embedded"] += day["embedded"]
+        if "error" in day:
+            results["errors"] += 1
+
+    async def on_day_failed(day: Dict[str, Any], stage: str, error: Exception) -> None:
+        results["errors"] += 1
+
+    results["stages"] = await run_stages(
+        iter_replay_days(directories, workers, results, start_date, end_date),
+        [Stage("insert", store_replayed_day, insert_workers, lambda day: day["added"] + day["updated"])],
+        STAGE_QUEUE_SIZE,
+        on_day_finished,
+        on_day_failed
+    )
+    results["duration"] = round(time.monotonic() - started, 3)
+    await publish_vector_index(results["documents_embedded"])
+
+    logger.info(
+        f"Replay completed: {results['directories_replayed']} directories, {results['days_processed']} days, "
+        f"{results['documents_added']} added, {results['documents_updated']} updated, {results['errors']} errors"
+    )
+    return results
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import logging
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+logger = logging.getLogger("stages")
+
+# Sentinel telling a stage worker that its input is exhausted
+_DONE = object()
+
+class Stage:
+    """One step of a staged pipeline
+
+    `handler` receives an item and returns the item to pass downstream, or
+    None to drop it. `count_documents` extracts a document count from a
+    handled item for the throughput counters.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[Optional[Any]]],
+        workers: int = 1,
+        count_documents: Optional[Callable[[Any], int]] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.count_documents = count_documents
+
+class StageStats:
+    """Throughput counters for one stage"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.documents = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def as_dict(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "documents": self.documents,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "items_per_second": round(self.items / elapsed, 3) if elapsed else 0.0,
+            "documents_per_second": round(self.documents / elapsed, 3) if elapsed else 0.0,
+            # Fraction of worker time spent handling items; the busiest stage is the bottleneck
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0.0
+        }
+
+async def run_stages(
+    source: Union[Iterable[Any], AsyncIterable[Any]],
+    stages: List[Stage],
+    queue_size: int = 8,
+    on_result: Optional[Callable[[Any], Awaitable[None]]] = None,
+    on_error: Optional[Callable[[Any, str, Exception], Awaitable[None]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Run items from `source` through `stages` joined by bounded queues
+
+    Every stage runs its own pool of workers, so stages overlap: while one
+    item is being written, the next can already be downloading. Bounded
+    queues apply backpressure so a fast producer cannot run ahead of a slow
+    consumer. Items leaving the last stage are passed to `on_result`; an item
+    whose handler raises is passed to `on_error` with the stage name and the
+    exception instead. Errors are counted per item and never stop a worker,
+    so a failing item or callback cannot leave the queues without consumers.
+    Returns per-stage throughput counters keyed by stage name.
+    """
+    queues = [asyncio.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    stats = [StageStats(stage.name, stage.workers) for stage in stages]
+    started = time.monotonic()
+
+    async def feed() -> None:
+        if hasattr(source, "__aiter__"):
+            async for item in source:
+                await queues[0].put(item)
+        else:
+            for item in source:
+                await queues[0].put(item)
+
+    async def fail(index: int, item: Any, error: Exception) -> None:
+        stats[index].errors += 1
+        if on_error:
+            try:
+                await on_error(item, stages[index].name, error)
+            except Exception as e:
+                logger.error(f"Error reporting a failed {stages[index].name} item: {str(e)}")
+
+    async def work(index: int) -> None:
+        stage, stage_stats = stages[index], stats[index]
+        in_queue = queues[index]
+        out_queue = queues[index + 1] if index + 1 < len(stages) else None
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+
+            handled_at = time.monotonic()
+            try:
+                result = await stage.handler(item)
+            except Exception as e:
+                logger.error(f"Error in {stage.name} stage: {str(e)}")
+                await fail(index, item, e)
+                continue
+            finally:
+                stage_stats.busy_seconds += time.monotonic() - handled_at
+
+            if result is None:
+                continue
+            stage_stats.items += 1
+            if stage.count_documents:
+                stage_stats.documents += stage.count_documents(result)
+
+            # Time blocked on a full downstream queue is backpressure
+            blocked_at = time.monotonic()
+            if out_queue is not None:
+                await out_queue.put(result)
+            elif on_result:
+                try:
+                    await on_result(result)
+                except Exception as e:
+                    logger.error(f"Error collecting a {stage.name} result: {str(e)}")
+                    stage_stats.errors += 1
+            stage_stats.wait_seconds += time.monotonic() - blocked_at
+
+    workers = [
+        [asyncio.create_task(work(index)) for _ in range(stage.workers)]
+        for index, stage in enumerate(stages)
+    ]
+
+    try:
+        await feed()
+        # Drain stage by stage: once a stage's workers exit, nothing more reaches the next one
+        for index, stage in enumerate(stages):
+            for _ in range(stage.workers):
+                await queues[index].put(_DONE)
+            await asyncio.gather(*workers[index])
+    finally:
+        for task in (task for stage_workers in workers for task in stage_workers):
+            task.cancel()
+
+    elapsed = time.monotonic() - started
+    return {stage_stats.name: stage_stats.as_dict(elapsed) for stage_stats in stats}
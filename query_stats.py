@@ -0,0 +1,201 @@
+import os
+import re
+import time
+import logging
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiomysql
+
+logger = logging.getLogger("query_stats")
+
+# Statements slower than this are logged and get their EXPLAIN plan captured
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Distinct statement fingerprints tracked; the least recently seen are dropped beyond this
+QUERY_STATS_SIZE = int(os.getenv("QUERY_STATS_SIZE", 500))
+# Seconds before the plan of a slow fingerprint is captured again
+EXPLAIN_INTERVAL = float(os.getenv("EXPLAIN_INTERVAL", 3600))
+
+# Slow executions kept for the report's recent list
+_RECENT_SLOW = 50
+# Multi-row INSERTs can be megabytes; their prefix identifies them
+_FINGERPRINT_INPUT = 4096
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_ROW = r"\(\s*\?(?:\s*,\s*\?)*\s*\)"
+_ROWS_RE = re.compile(rf"({_ROW})(?:\s*,\s*{_ROW})+")
+_LIST_RE = re.compile(_ROW)
+_SPACE_RE = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def fingerprint_sql(sql: str) -> str:
+    """Normalize a statement so executions differing only in values share a fingerprint
+
+    Literals and placeholders become ?, value lists and multi-row VALUES
+    collapse to (?+), and whitespace is squeezed.
+    """
+    sql = _STRING_RE.sub("?", sql[:_FINGERPRINT_INPUT])
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _ROWS_RE.sub(r"\1", sql)
+    sql = _LIST_RE.sub("(?+)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+class QueryStats:
+    """Rolling timings per statement fingerprint, with plans for slow ones
+
+    Every database round trip is recorded against its fingerprint. An
+    execution over `threshold_ms` is logged; the first slow execution of a
+    SELECT fingerprint (and again every EXPLAIN_INTERVAL seconds) asks the
+    caller to capture its EXPLAIN plan, which is kept with the fingerprint.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, max_size: int = QUERY_STATS_SIZE):
+        self.threshold_ms = threshold_ms
+        self.max_size = max_size
+        self.statements = 0
+        self.slow = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._recent: "deque[Dict[str, Any]]" = deque(maxlen=_RECENT_SLOW)
+
+    def record(self, sql, elapsed_ms: float) -> Optional[str]:
+        """Record one execution; returns its fingerprint if the plan should be captured"""
+        if isinstance(sql, (bytes, bytearray)):
+            sql = bytes(sql[:_FINGERPRINT_INPUT]).decode("utf-8", "replace")
+        fingerprint = fingerprint_sql(sql)
+
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            entry = self._entries[fingerprint] = {
+                "fingerprint": fingerprint, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "slow": 0, "plan": None, "plan_at": None
+            }
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(fingerprint)
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        self.statements += 1
+
+        if elapsed_ms < self.threshold_ms:
+            return None
+        self.slow += 1
+        entry["slow"] += 1
+        self._recent.append({"fingerprint": fingerprint, "ms": round(elapsed_ms, 1), "at": time.time()})
+        logger.warning(f"Slow query ({elapsed_ms:.0f} ms): {fingerprint}")
+
+        if not fingerprint.upper().startswith("SELECT"):
+            return None
+        if entry["plan_at"] is not None and time.monotonic() - entry["plan_at"] < EXPLAIN_INTERVAL:
+            return None
+        entry["plan_at"] = time.monotonic()
+        return fingerprint
+
+    def set_plan(self, fingerprint: str, plan: List[Dict[str, Any]]) -> None:
+        entry = self._entries.get(fingerprint)
+        if entry is not None:
+            entry["plan"] = plan
+        logger.warning(f"Plan for slow query {fingerprint}: {plan}")
+
+    def report(self, limit: int = 10, sort: str = "total_ms") -> Dict[str, Any]:
+        """Top `limit` fingerprints by total_ms, max_ms, avg_ms, count or slow"""
+        rows = []
+        for entry in self._entries.values():
+            row = {key: value for key, value in entry.items() if key != "plan_at"}
+            row["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+            row["total_ms"] = round(entry["total_ms"], 3)
+            row["max_ms"] = round(entry["max_ms"], 3)
+            rows.append(row)
+        if rows and sort not in rows[0]:
+            raise ValueError(f"Unknown sort key: {sort}")
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return {
+            "threshold_ms": self.threshold_ms,
+            "statements": self.statements,
+            "slow": self.slow,
+            "fingerprints": len(self._entries),
+            "top": rows[:limit],
+            "recent_slow": list(self._recent)[::-1]
+        }
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.slow = 0
+        self._entries.clear()
+        self._recent.clear()
+
+query_stats = QueryStats()
+
+def get_query_stats(limit: int = 10, sort: str = "total_ms") -> Dict[str, Any]:
+    """Rolling top-N statement report for monitoring"""
+    return query_stats.report(limit, sort)
+
+async def _explain(conn, fingerprint: str, statement: str) -> None:
+    try:
+        # A plain cursor, so the EXPLAIN itself is not recorded
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(f"EXPLAIN {statement}")
+            query_stats.set_plan(fingerprint, list(await cur.fetchall()))
+    except Exception as e:
+        logger.error(f"Error explaining slow query: {str(e)}")
+
+class TimedDictCursor(aiomysql.DictCursor):
+    """DictCursor that records every execute() in query_stats
+
+    executemany() is recorded once against its statement template: the
+    batches it expands and sends through execute() carry row data and would
+    each get their own fingerprint.
+    """
+
+    _in_executemany = False
+
+    async def executemany(self, query, args):
+        started = time.perf_counter()
+        self._in_executemany = True
+        try:
+            result = await super().executemany(query, args)
+        finally:
+            self._in_executemany = False
+        query_stats.record(query, (time.perf_counter() - started) * 1000)
+        return result
+
+    async def execute(self, query, args=None):
+        if self._in_executemany:
+            return await super().execute(query, args)
+        started = time.perf_counter()
+        result = await super().execute(query, args)
+        fingerprint = query_stats.record(query, (time.perf_counter() - started) * 1000)
+        if fingerprint:
+            # Rows are already buffered, so the connection is free for the EXPLAIN
+            await _explain(self.connection, fingerprint, self.mogrify(query, args))
+        return result
+
+class TimedSSDictCursor(aiomysql.SSDictCursor):
+    """Streaming counterpart of TimedDictCursor
+
+    Time to the first row is recorded; the plan is captured once the
+    cursor is closed, since the connection is busy while rows stream.
+    """
+
+    _pending_explain: Optional[Tuple[str, str]] = None
+
+    async def execute(self, query, args=None):
+        started = time.perf_counter()
+        result = await super().execute(query, args)
+        fingerprint = query_stats.record(query, (time.perf_counter() - started) * 1000)
+        if fingerprint:
+            self._pending_explain = (fingerprint, self.mogrify(query, args))
+        return result
+
+    async def close(self):
+        conn = self._connection
+        await super().close()
+        if self._pending_explain and conn is not None:
+            fingerprint, statement = self._pending_explain
+            self._pending_explain = None
+            await _explain(conn, fingerprint, statement)
@@ -19,9 +19,9 @@ def run_pipeline():
     """Run the data pipeline to fetch the latest Federal Register data"""
     logger.info("Starting data pipeline...")
     try:
-        from pipeline.main import run_pipeline
+        from pipeline.main import run_pipeline, run_and_close_pool
         import asyncio
-        result = asyncio.run(run_pipeline())
+        result = asyncio.run(run_and_close_pool(run_pipeline()))
         logger.info(f"Pipeline completed successfully: {result}")
         return True
     except Exception as e:
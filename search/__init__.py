@@ -0,0 +1 @@
+# Search package for Federal Register assistant
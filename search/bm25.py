@@ -0,0 +1,229 @@
+import math
+import logging
+from array import array
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from search.embeddings import tokenize
+
+logger = logging.getLogger("bm25")
+
+# Compact postings once this fraction of slots belongs to replaced documents
+_COMPACT_DEAD_RATIO = 0.25
+
+DateLike = Union[str, date, datetime, None]
+
+def _ordinal(value: DateLike) -> int:
+    """Day ordinal of a date, 0 when unknown"""
+    if not value:
+        return 0
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+    return value.toordinal()
+
+class BM25Index:
+    """Compact in-memory inverted index over document titles and abstracts
+
+    Documents get integer slots; each term's postings are two parallel
+    `array`s (slots and term frequencies), so the index costs about 8 bytes
+    per posting and scoring a query is a handful of vectorized NumPy
+    operations over the query terms' postings. Publication date and type are
+    kept per slot, so filtered searches never need the database.
+
+    Documents are added incrementally; re-adding a document retires its old
+    slot, and postings are compacted once enough slots are retired.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._term_ids: Dict[str, int] = {}
+        self._postings: List[array] = []
+        self._freqs: List[array] = []
+        self._doc_ids = array("q")
+        self._lengths = array("i")
+        self._dates = array("i")
+        self._types = array("h")
+        self._live = bytearray()
+        self._slots: Dict[int, int] = {}
+        self._type_codes: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._slots
+
+    def add(self, doc_id: int, text: str, document_type: Optional[str] = None, publication_date: DateLike = None) -> None:
+        """Index a document, replacing any previous version of it"""
+        if doc_id in self._slots:
+            self.remove(doc_id)
+
+        tokens = tokenize(text)
+        slot = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        self._lengths.append(len(tokens))
+        self._dates.append(_ordinal(publication_date))
+        self._types.append(self._type_code(document_type))
+        self._live.append(1)
+        self._slots[doc_id] = slot
+        self._total_length += len(tokens)
+
+        for term, count in Counter(tokens).items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._postings)
+                self._postings.append(array("i"))
+                self._freqs.append(array("i"))
+            self._postings[term_id].append(slot)
+            self._freqs[term_id].append(count)
+
+    def remove(self, doc_id: int) -> None:
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return
+        self._live[slot] = 0
+        self._total_length -= self._lengths[slot]
+        if len(self._doc_ids) - len(self._slots) > _COMPACT_DEAD_RATIO * len(self._doc_ids):
+            self.compact()
+
+    def matches(
+        self,
+        doc_id: int,
+        document_type: Optional[str] = None,
+        start_date: DateLike = None,
+        end_date: DateLike = None
+    ) -> bool:
+        """Whether an indexed document passes the type and date filters"""
+        slot = self._slots.get(doc_id)
+        if slot is None:
+            return False
+        if document_type and self._types[slot] != self._type_codes.get(document_type, -2):
+            return False
+        if start_date and self._dates[slot] < _ordinal(start_date):
+            return False
+        if end_date and self._dates[slot] > _ordinal(end_date):
+            return False
+        return True
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        document_type: Optional[str] = None,
+        start_date: DateLike = None,
+        end_date: DateLike = None,
+        offset: int = 0
+    ) -> List[Tuple[int, float]]:
+        """BM25-ranked (document id, score) pairs for `query`, best first"""
+        terms = [self._term_ids[term] for term in set(tokenize(query)) if term in self._term_ids]
+        if not terms or not self._slots:
+            return []
+
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)
+        live_count = len(self._slots)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / live_count or 1))
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for term_id in terms:
+            slots = np.frombuffer(self._postings[term_id], dtype=np.int32)
+            freqs = np.frombuffer(self._freqs[term_id], dtype=np.int32).astype(np.float32)
+            idf = math.log(1 + (live_count - len(slots) + 0.5) / (len(slots) + 0.5))
+            scores[slots] += idf * freqs * (self.k1 + 1) / (freqs + length_norm[slots])
+
+        mask = self._filter(scores > 0, document_type, start_date, end_date)
+
+        candidates = np.flatnonzero(mask)
+        wanted = offset + k
+        if len(candidates) > wanted:
+            candidates = candidates[np.argpartition(-scores[candidates], wanted - 1)[:wanted]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")][offset:wanted]
+        return [(self._doc_ids[slot], float(scores[slot])) for slot in ranked]
+
+    def newest(
+        self,
+        query: str,
+        k: int = 10,
+        document_type: Optional[str] = None,
+        start_date: DateLike = None,
+        end_date: DateLike = None,
+        after: Optional[Tuple[str, int]] = None
+    ) -> List[int]:
+        """Ids of documents containing any query term, newest first
+
+        Ordered by (publication date, id) descending like the database's
+        keyset pages; `after` is the (publication_date, id) the previous
+        page ended on.
+        """
+        terms = [self._term_ids[term] for term in set(tokenize(query)) if term in self._term_ids]
+        if not terms or not self._slots:
+            return []
+
+        matched = np.zeros(len(self._doc_ids), dtype=bool)
+        for term_id in terms:
+            matched[np.frombuffer(self._postings[term_id], dtype=np.int32)] = True
+        mask = self._filter(matched, document_type, start_date, end_date)
+
+        dates = np.frombuffer(self._dates, dtype=np.int32)
+        doc_ids = np.frombuffer(self._doc_ids, dtype=np.int64)
+        if after:
+            after_date, after_id = _ordinal(after[0]), after[1]
+            mask &= (dates < after_date) | ((dates == after_date) & (doc_ids < after_id))
+
+        candidates = np.flatnonzero(mask)
+        ranked = candidates[np.lexsort((-doc_ids[candidates], -dates[candidates]))][:k]
+        return [self._doc_ids[slot] for slot in ranked]
+
+    def _filter(
+        self,
+        mask: np.ndarray,
+        document_type: Optional[str],
+        start_date: DateLike,
+        end_date: DateLike
+    ) -> np.ndarray:
+        """Narrow a per-slot mask to live slots passing the type and date filters"""
+        mask = mask & np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+        if document_type:
+            mask &= np.frombuffer(self._types, dtype=np.int16) == self._type_codes.get(document_type, -2)
+        if start_date:
+            mask &= np.frombuffer(self._dates, dtype=np.int32) >= _ordinal(start_date)
+        if end_date:
+            mask &= np.frombuffer(self._dates, dtype=np.int32) <= _ordinal(end_date)
+        return mask
+
+    def compact(self) -> None:
+        """Drop retired slots from every postings list and renumber the rest"""
+        live = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+        new_slots = np.cumsum(live, dtype=np.int64) - 1
+
+        for term_id in range(len(self._postings)):
+            slots = np.frombuffer(self._postings[term_id], dtype=np.int32)
+            keep = live[slots]
+            self._postings[term_id] = array("i", new_slots[slots[keep]].astype(np.int32).tobytes())
+            self._freqs[term_id] = array("i", np.frombuffer(self._freqs[term_id], dtype=np.int32)[keep].tobytes())
+
+        self._doc_ids = array("q", np.frombuffer(self._doc_ids, dtype=np.int64)[live].tobytes())
+        self._lengths = array("i", np.frombuffer(self._lengths, dtype=np.int32)[live].tobytes())
+        self._dates = array("i", np.frombuffer(self._dates, dtype=np.int32)[live].tobytes())
+        self._types = array("h", np.frombuffer(self._types, dtype=np.int16)[live].tobytes())
+        self._live = bytearray(b"\x01" * len(self._doc_ids))
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(self._doc_ids)}
+
+    def _type_code(self, document_type: Optional[str]) -> int:
+        if not document_type:
+            return -1
+        code = self._type_codes.get(document_type)
+        if code is None:
+            code = self._type_codes[document_type] = len(self._type_codes)
+        return code
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank) per list, best first"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
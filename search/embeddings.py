@@ -0,0 +1,101 @@
+import os
+import re
+import math
+import zlib
+import logging
+from collections import Counter
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("embeddings")
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 384))
+# Words per abstract chunk and words shared by consecutive chunks
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", 200))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 40))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words too common in Federal Register text to carry meaning
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens without stopwords"""
+    return [token for token in _TOKEN_RE.findall((text or "").lower()) if token not in STOPWORDS]
+
+@lru_cache(maxsize=200000)
+def _bucket(feature: str, dim: int) -> int:
+    """Signed bucket of a feature: index + 1, negated for the negative sign"""
+    # crc32 is stable across processes, unlike hash()
+    h = zlib.crc32(feature.encode("utf-8"))
+    index = h % dim + 1
+    return -index if h & 0x80000000 else index
+
+class HashingEmbedder:
+    """Local CPU text embedder based on the hashing trick
+
+    Unigrams and bigrams are hashed into `dim` signed buckets with sublinear
+    term frequency and the vectors are L2-normalized, so dot products are
+    cosine similarities. There is no vocabulary to fit or ship, embedding is
+    deterministic across processes, and no model or network call is needed.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, bigrams: bool = True):
+        self.dim = dim
+        self.bigrams = bigrams
+
+    def features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        if self.bigrams:
+            tokens = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch of texts into an (n, dim) float32 matrix"""
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[float] = []
+        for row, text in enumerate(texts):
+            for feature, count in Counter(self.features(text)).items():
+                bucket = _bucket(feature, self.dim)
+                rows.append(row)
+                cols.append(abs(bucket) - 1)
+                weight = 1.0 + math.log(count)
+                values.append(weight if bucket > 0 else -weight)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.asarray(rows), np.asarray(cols)), np.asarray(values, dtype=np.float32))
+        return normalize_rows(matrix)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+def chunk_document(title: str, abstract: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split a document into overlapping word windows of its abstract
+
+    Every chunk is prefixed with the title, so a chunk stays attributable on
+    its own; a document without an abstract is a single title chunk.
+    """
+    title = (title or "").strip()
+    words = (abstract or "").split()
+    if not words:
+        return [title] if title else []
+
+    step = max(1, size - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(f"{title}\n{' '.join(words[start:start + size])}".strip())
+        if start + size >= len(words):
+            break
+    return chunks
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place, leaving all-zero rows untouched"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
@@ -0,0 +1,246 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_common import standardize_document_type, query_cache, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from db_backend import (
+    iter_documents_for_index, iter_document_deletions, get_documents_by_ids, query_documents_page,
+    supports_keyword_filter
+)
+from search.bm25 import BM25Index, reciprocal_rank_fusion
+from search.semantic import embedder, get_vector_index
+
+logger = logging.getLogger("hybrid")
+
+# Seconds between checks for documents changed by other processes
+KEYWORD_INDEX_REFRESH = float(os.getenv("KEYWORD_INDEX_REFRESH", 5))
+# Seconds re-read behind the watermark; must cover the longest ingest transaction
+KEYWORD_INDEX_LAG = float(os.getenv("KEYWORD_INDEX_LAG", 300))
+# Candidates taken from each ranking per requested result before fusion
+_FUSION_DEPTH = 3
+# Prefix of cursors that page through ranked (rather than newest-first) results
+_RANK_CURSOR = "rank:"
+# Orders accepted by search_documents_page
+RANK_DATE = "date"
+RANK_RELEVANCE = "relevance"
+
+_index = BM25Index()
+_watermark = None
+_deletion_watermark = None
+_seen: Dict[int, Any] = {}
+_generation = -1
+_checked_at = 0.0
+_index_lock = asyncio.Lock()
+
+def _since(watermark):
+    """Watermark moved back by KEYWORD_INDEX_LAG
+
+    updated_at is stamped when a row is written but only visible once its
+    transaction commits, so a slow ingest can commit rows stamped before a
+    watermark that a faster one already advanced.
+    """
+    if watermark is None:
+        return None
+    if isinstance(watermark, str):
+        # SQLite stores CURRENT_TIMESTAMP as text
+        since = datetime.strptime(watermark, "%Y-%m-%d %H:%M:%S") - timedelta(seconds=KEYWORD_INDEX_LAG)
+        return since.strftime("%Y-%m-%d %H:%M:%S")
+    return watermark - timedelta(seconds=KEYWORD_INDEX_LAG)
+
+async def refresh_keyword_index() -> int:
+    """Index every document changed since the last refresh (everything on the first call)
+
+    Documents removed from the table since the last refresh (archived
+    partitions, re-dated rows) are dropped from the index.
+    """
+    global _watermark, _deletion_watermark, _seen
+    indexed = 0
+    watermark = _watermark
+    since = _since(_watermark)
+    # Rows inside the lag window already indexed at their current version are skipped
+    seen = {}
+    async for row in iter_documents_for_index(since):
+        if since is not None:
+            seen[row["id"]] = row["updated_at"]
+            if _seen.get(row["id"]) == row["updated_at"]:
+                continue
+        _index.add(
+            row["id"],
+            f"{row['title'] or ''} {row['abstract'] or ''}",
+            row["document_type"],
+            row["publication_date"]
+        )
+        if row["updated_at"] and (watermark is None or row["updated_at"] > watermark):
+            watermark = row["updated_at"]
+        indexed += 1
+        # Keep the event loop responsive during the initial load
+        if indexed % 1000 == 0:
+            await asyncio.sleep(0)
+    if _watermark is None:
+        # The first load only read live rows; later deletions count from here
+        deletion_watermark = watermark
+    else:
+        deletion_watermark = _deletion_watermark
+        async for row in iter_document_deletions(_since(_deletion_watermark)):
+            _index.remove(row["document_id"])
+            if row["deleted_at"] and (deletion_watermark is None or row["deleted_at"] > deletion_watermark):
+                deletion_watermark = row["deleted_at"]
+    _watermark = watermark
+    _deletion_watermark = deletion_watermark
+    _seen = seen
+    return indexed
+
+async def get_keyword_index() -> BM25Index:
+    """Shared BM25 index, refreshed after in-process ingests or every KEYWORD_INDEX_REFRESH seconds
+
+    Rows are re-read from KEYWORD_INDEX_LAG seconds before the updated_at
+    watermark, so documents sharing the watermark second or committed late by
+    a concurrent ingest are never missed (re-adding is idempotent).
+    """
+    global _generation, _checked_at
+    async with _index_lock:
+        if (
+            _watermark is None
+            or _generation != query_cache.generation
+            or time.monotonic() - _checked_at > KEYWORD_INDEX_REFRESH
+        ):
+            generation = query_cache.generation
+            started = time.monotonic()
+            first_load = _watermark is None
+            indexed = await refresh_keyword_index()
+            _generation = generation
+            _checked_at = time.monotonic()
+            if first_load:
+                logger.info(f"Built keyword index over {indexed} documents in {_checked_at - started:.1f}s")
+        return _index
+
+async def keyword_search(
+    query: str,
+    limit: int = 10,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """BM25-ranked documents for `query`, with their scores"""
+    index = await get_keyword_index()
+    hits = index.search(
+        query, limit, standardize_document_type(document_type) if document_type else None,
+        start_date, end_date, offset
+    )
+    return await _resolve(hits)
+
+async def hybrid_search(
+    query: str,
+    limit: int = 10,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """BM25 and vector rankings fused with reciprocal rank fusion
+
+    Vector hits are filtered by type and date through the keyword index, so
+    neither ranking needs the database; only the final page is fetched.
+    """
+    document_type = standardize_document_type(document_type) if document_type else None
+    depth = (offset + limit) * _FUSION_DEPTH
+
+    index = await get_keyword_index()
+    keyword_hits = index.search(query, depth, document_type, start_date, end_date)
+
+    vector_index = await get_vector_index()
+    vector_hits = [
+        (doc_id, score)
+        for doc_id, score in vector_index.search(embedder.embed_one(query), k=depth)[0]
+        if score > 0 and index.matches(doc_id, document_type, start_date, end_date)
+    ]
+
+    fused = reciprocal_rank_fusion([
+        [doc_id for doc_id, _ in keyword_hits],
+        [doc_id for doc_id, _ in vector_hits]
+    ])
+    return await _resolve(fused[offset:offset + limit])
+
+async def keyword_documents_page(
+    keywords: str,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 10
+) -> Dict[str, Any]:
+    """Newest-first keyword page served by the keyword index
+
+    For databases that cannot filter by keywords themselves (a partitioned
+    MySQL table has no FULLTEXT index). Takes and returns the same keyset
+    cursors as query_documents_page.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    index = await get_keyword_index()
+    ids = index.newest(
+        keywords, limit + 1, standardize_document_type(document_type) if document_type else None,
+        start_date, end_date, after
+    )
+    documents = await get_documents_by_ids(ids[:limit])
+    next_cursor = None
+    if len(ids) > limit and documents:
+        last = documents[-1]
+        next_cursor = encode_cursor(last["publication_date"], last["id"])
+    return {"documents": documents, "next_cursor": next_cursor}
+
+async def search_documents_page(
+    keywords: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 10,
+    rank: Optional[str] = None
+) -> Dict[str, Any]:
+    """One page of documents, newest first unless `rank` is "relevance"
+
+    Relevance-ranked keyword searches use hybrid BM25 + vector ranking and
+    fall back to newest-first keyword matches when the in-process indexes
+    find nothing. Newest-first keyword pages come from the keyword index when
+    the database cannot filter by keywords. Returns the same {"documents", "next_cursor"} shape as
+    query_documents_page and, like it, raises ValueError for a malformed
+    cursor or an unknown `rank`.
+    """
+    limit = max(1, min(int(limit or 10), MAX_PAGE_SIZE))
+    rank = rank or RANK_DATE
+    if rank not in (RANK_DATE, RANK_RELEVANCE):
+        raise ValueError(f"Unknown rank: {rank}")
+    if rank == RANK_RELEVANCE and keywords and (not cursor or cursor.startswith(_RANK_CURSOR)):
+        offset = _rank_offset(cursor) if cursor else 0
+        documents = await hybrid_search(keywords, limit, document_type, start_date, end_date, offset)
+        if documents or offset:
+            next_cursor = f"{_RANK_CURSOR}{offset + limit}" if len(documents) == limit else None
+            return {"documents": documents, "next_cursor": next_cursor}
+
+    if keywords and not await supports_keyword_filter():
+        return await keyword_documents_page(keywords, document_type, start_date, end_date, cursor, limit)
+    return await query_documents_page(keywords, document_type, start_date, end_date, cursor, limit)
+
+def _rank_offset(cursor: str) -> int:
+    try:
+        offset = int(cursor[len(_RANK_CURSOR):])
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+async def _resolve(hits) -> List[Dict[str, Any]]:
+    scores = dict(hits)
+    documents = await get_documents_by_ids([doc_id for doc_id, _ in hits])
+    for doc in documents:
+        doc["score"] = round(scores[doc["id"]], 4)
+    return documents
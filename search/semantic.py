@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_backend import iter_embeddings, get_documents_by_ids
+from search.embeddings import HashingEmbedder
+from search.vector import VectorIndex
+
+logger = logging.getLogger("semantic")
+
+# Saved index builds live in VECTOR_INDEX_DIR/<build id>/; current.json names the live one
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "data/index")
+_CURRENT_FILE = "current.json"
+# Superseded builds kept for processes that still have them mapped
+_KEEP_OLD_BUILDS = 2
+
+embedder = HashingEmbedder()
+
+_index: Optional[VectorIndex] = None
+_index_build: Optional[str] = None
+_index_lock = asyncio.Lock()
+
+async def build_vector_index(index_dir: str = VECTOR_INDEX_DIR) -> VectorIndex:
+    """Build the index from the stored float32 embeddings and publish it to `index_dir`
+
+    Run by the writer (pipeline) side. Readers pick the new build up on
+    their next query; the switch is a single atomic rename of current.json.
+    """
+    ids: List[int] = []
+    packed = bytearray()
+    row_bytes = embedder.dim * 4
+    skipped = 0
+    async for document_id, embedding in iter_embeddings():
+        if len(embedding) != row_bytes:
+            skipped += 1
+            continue
+        ids.append(document_id)
+        packed += embedding
+    if skipped:
+        logger.warning(f"Skipped {skipped} embeddings whose dimension is not {embedder.dim}")
+
+    matrix = np.frombuffer(packed, dtype="<f4").reshape(len(ids), embedder.dim)
+    loop = asyncio.get_running_loop()
+    index = await loop.run_in_executor(None, VectorIndex.build, matrix, np.asarray(ids, dtype=np.int64))
+
+    build_id = f"{int(time.time() * 1000)}-{os.getpid()}"
+    await loop.run_in_executor(None, index.save, os.path.join(index_dir, build_id))
+    _publish_build(index_dir, build_id, len(index))
+    logger.info(f"Published vector index build {build_id} with {len(index)} embeddings")
+    return index
+
+async def publish_vector_index(embedded: int) -> None:
+    """Rebuild the shared index after a pipeline run that changed embeddings"""
+    if not embedded:
+        return
+    try:
+        await build_vector_index()
+    except Exception as e:
+        logger.error(f"Error building vector index: {str(e)}")
+
+def _publish_build(index_dir: str, build_id: str, rows: int) -> None:
+    tmp_path = os.path.join(index_dir, f"{_CURRENT_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"build": build_id, "rows": rows, "dim": embedder.dim}, f)
+    os.replace(tmp_path, os.path.join(index_dir, _CURRENT_FILE))
+
+    # Older builds can go; open mappings stay valid after unlink
+    builds = sorted(
+        name for name in os.listdir(index_dir)
+        if name != build_id and os.path.isdir(os.path.join(index_dir, name))
+    )
+    for name in builds[:-_KEEP_OLD_BUILDS]:
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+def current_build(index_dir: str = VECTOR_INDEX_DIR) -> Optional[str]:
+    """Id of the published index build, if any"""
+    try:
+        with open(os.path.join(index_dir, _CURRENT_FILE), "r") as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return current["build"] if current.get("dim") == embedder.dim else None
+
+async def get_vector_index() -> VectorIndex:
+    """Shared read-only index, re-mapped whenever a new build is published
+
+    Only the first process to find no published build reads the
+    embeddings table; everyone else memory-maps the saved files.
+    """
+    global _index, _index_build
+    async with _index_lock:
+        build_id = current_build()
+        if build_id is None:
+            _index = await build_vector_index()
+            _index_build = current_build()
+        elif build_id != _index_build:
+            _index = VectorIndex.open(os.path.join(VECTOR_INDEX_DIR, build_id))
+            _index_build = build_id
+            logger.info(f"Mapped vector index build {build_id} ({len(_index)} embeddings)")
+        return _index
+
+async def semantic_search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Documents most similar in meaning to `query`, with their cosine similarity"""
+    if not query or not query.strip():
+        return []
+
+    index = await get_vector_index()
+    hits = index.search(embedder.embed_one(query), k=max(1, int(limit)))[0]
+    # Documents sharing no features with the query are not results
+    hits = [(doc_id, score) for doc_id, score in hits if score > 0]
+    scores = dict(hits)
+
+    documents = await get_documents_by_ids([doc_id for doc_id, _ in hits])
+    for doc in documents:
+        doc["similarity"] = round(scores[doc["id"]], 4)
+    return documents
@@ -0,0 +1,186 @@
+import os
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from search.embeddings import normalize_rows
+
+logger = logging.getLogger("vector")
+
+# IVF partitioning is used automatically from this many vectors (0 disables)
+VECTOR_IVF_MIN_ROWS = int(os.getenv("VECTOR_IVF_MIN_ROWS", 50000))
+# Number of nearest partitions scanned per query
+VECTOR_IVF_PROBE = int(os.getenv("VECTOR_IVF_PROBE", 8))
+
+# Rows scored per matrix product, bounding the (queries x rows) score buffer
+_SEARCH_BLOCK_ROWS = 65536
+# Chunks fetched per requested document before de-duplicating by document
+_CHUNK_OVERSAMPLE = 4
+# Rows sampled per partition to train the coarse quantizer
+_IVF_TRAIN_ROWS_PER_LIST = 64
+
+class VectorIndex:
+    """Exact or IVF-partitioned cosine similarity index over chunk embeddings
+
+    Vectors are held as one contiguous, L2-normalized float32 matrix (in
+    memory, or memory-mapped from a saved index), so a batch of queries is
+    scored with a single matrix product per block of rows. Each row belongs
+    to a document id; search returns the best-scoring chunk per document.
+
+    With IVF enabled, rows are clustered around `n_lists` centroids (spherical
+    k-means) and stored grouped by cluster, so a query only scores the rows of
+    its `n_probe` nearest clusters, each a contiguous slice of the matrix.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        centroids: Optional[np.ndarray] = None,
+        list_offsets: Optional[np.ndarray] = None
+    ):
+        self.vectors = vectors
+        self.ids = ids
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray, n_lists: Optional[int] = None, seed: int = 0) -> "VectorIndex":
+        """Build an index, partitioning it when large enough
+
+        `n_lists` of None picks sqrt(rows) partitions once the index reaches
+        VECTOR_IVF_MIN_ROWS; 0 or 1 forces exact search.
+        """
+        vectors = normalize_rows(np.array(vectors, dtype=np.float32, order="C"))
+        ids = np.asarray(ids, dtype=np.int64)
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(vectors))) if VECTOR_IVF_MIN_ROWS and len(vectors) >= VECTOR_IVF_MIN_ROWS else 0
+        if n_lists <= 1 or len(vectors) < n_lists:
+            return cls(vectors, ids)
+
+        centroids = _train_centroids(vectors, n_lists, seed)
+        assignments = _assign(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        logger.info(f"Built IVF vector index: {len(vectors)} vectors in {n_lists} partitions")
+        return cls(np.ascontiguousarray(vectors[order]), ids[order], centroids, list_offsets)
+
+    def save(self, directory: str) -> None:
+        """Write the index as .npy files that open() can memory-map"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "ids.npy"), self.ids)
+        if self.centroids is not None:
+            np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+            np.save(os.path.join(directory, "list_offsets.npy"), self.list_offsets)
+
+    @classmethod
+    def open(cls, directory: str) -> "VectorIndex":
+        """Memory-map a saved index read-only
+
+        Pages are loaded on demand and shared through the OS page cache, so
+        every process serving the same index file shares one copy.
+        """
+        centroids = list_offsets = None
+        if os.path.exists(os.path.join(directory, "centroids.npy")):
+            centroids = np.load(os.path.join(directory, "centroids.npy"))
+            list_offsets = np.load(os.path.join(directory, "list_offsets.npy"))
+        return cls(
+            np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "ids.npy"), mmap_mode="r"),
+            centroids,
+            list_offsets
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def search(self, queries: np.ndarray, k: int = 10, n_probe: int = VECTOR_IVF_PROBE) -> List[List[Tuple[int, float]]]:
+        """Top-k documents by cosine similarity for each query vector
+
+        Returns one list of (document id, score) pairs per query, best first.
+        """
+        queries = normalize_rows(np.array(np.atleast_2d(queries), dtype=np.float32))
+        if len(self) == 0:
+            return [[] for _ in range(len(queries))]
+
+        candidates = min(len(self), k * _CHUNK_OVERSAMPLE)
+        if self.centroids is None:
+            rows, scores = _top_rows(queries, self.vectors, candidates)
+            return [self._documents(rows[i], scores[i], k) for i in range(len(queries))]
+
+        # Coarse step: nearest partitions per query, then exact scoring inside them
+        n_probe = max(1, min(n_probe, len(self.centroids)))
+        nearest_lists = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :n_probe]
+        results = []
+        for query, lists in zip(queries, nearest_lists):
+            row_ids = np.concatenate([
+                np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in lists
+            ])
+            if len(row_ids) == 0:
+                results.append([])
+                continue
+            rows, scores = _top_rows(query[None, :], self.vectors[row_ids], min(len(row_ids), candidates))
+            results.append(self._documents(row_ids[rows[0]], scores[0], k))
+        return results
+
+    def _documents(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Collapse chunk hits to the best score per document"""
+        best: Dict[int, float] = {}
+        for row, score in zip(rows, scores):
+            doc_id = int(self.ids[row])
+            if doc_id not in best:
+                best[doc_id] = float(score)
+                if len(best) == k:
+                    break
+        return list(best.items())
+
+def _top_rows(queries: np.ndarray, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k best rows per query, best first"""
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), _SEARCH_BLOCK_ROWS):
+        scores = queries @ vectors[start:start + _SEARCH_BLOCK_ROWS].T
+        take = min(k, scores.shape[1])
+        rows = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        best_rows = np.concatenate([best_rows, rows + start], axis=1)
+        best_scores = np.concatenate([best_scores, np.take_along_axis(scores, rows, axis=1)], axis=1)
+        if best_rows.shape[1] > k:
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every row"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _SEARCH_BLOCK_ROWS):
+        assignments[start:start + _SEARCH_BLOCK_ROWS] = np.argmax(
+            vectors[start:start + _SEARCH_BLOCK_ROWS] @ centroids.T, axis=1
+        )
+    return assignments
+
+def _train_centroids(vectors: np.ndarray, n_lists: int, seed: int, iterations: int = 10) -> np.ndarray:
+    """Spherical k-means on a sample of the rows"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_lists * _IVF_TRAIN_ROWS_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        # Empty partitions keep their previous centroid
+        filled = np.bincount(assignments, minlength=n_lists) > 0
+        centroids[filled] = sums[filled]
+        centroids = normalize_rows(centroids)
+    return centroids